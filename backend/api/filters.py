@@ -1,17 +1,23 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Recipe, Tag
+from recipes.catalog import tag_slug_map
+from recipes.models import Recipe, TagRecipe
+from rest_framework.filters import OrderingFilter
+
+
+def tag_choices():
+    return [(slug, slug) for slug in tag_slug_map.refresh()]
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name="tags__slug",
-        to_field_name="slug",
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices, method="tags_filter"
     )
     is_favorited = filters.BooleanFilter(method="is_favorite_filter")
     is_in_shopping_cart = filters.BooleanFilter(
         method="is_in_shopping_list_filter"
     )
+    search = filters.CharFilter(method="search_filter")
 
     class Meta:
         model = Recipe
@@ -20,14 +26,57 @@ class RecipeFilter(FilterSet):
             "author",
         )
 
+    def tags_filter(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов, без дублей строк."""
+        return queryset.filter(
+            Exists(
+                TagRecipe.objects.filter(
+                    recipe=OuterRef("pk"), tag_id__in=tag_slug_map.ids(value)
+                )
+            )
+        )
+
+    def with_user_flags(self, queryset):
+        """Флаги пользователя есть только в выборке списка и карточки,
+        для остальных действий они добавляются здесь."""
+        if "is_favorited" in queryset.query.annotations:
+            return queryset
+        return queryset.with_user_flags(self.request.user)
+
     def is_favorite_filter(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(favorite__user=user)
+            return self.with_user_flags(queryset).filter(is_favorited=True)
         return queryset
 
     def is_in_shopping_list_filter(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(shopping_list__user=user)
+            return self.with_user_flags(queryset).filter(
+                is_in_shopping_cart=True
+            )
         return queryset
+
+    def search_filter(self, queryset, name, value):
+        return queryset.search(value)
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """Сортировка рецептов, например ?ordering=-favorites_count.
+
+    К сортировке добавляется -id, чтобы порядок был однозначным и совпадал
+    с индексом recipe_favorites_count_idx. При поиске по умолчанию
+    сортирует по релевантности.
+    """
+
+    def get_default_ordering(self, view):
+        if self.is_search:
+            return ["-rank"]
+        return super().get_default_ordering(view)
+
+    def get_ordering(self, request, queryset, view):
+        self.is_search = "rank" in queryset.query.annotations
+        ordering = list(super().get_ordering(request, queryset, view))
+        if ordering and ordering[-1].lstrip("-") != "id":
+            ordering.append("-id")
+        return ordering
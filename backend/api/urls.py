@@ -2,7 +2,8 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (DownloadShoppingCartView, IngredientViewSet, RecipeViewSet,
-                    ShoppingCartViewSet, TagViewSet)
+                    ShoppingCartRenderJobView, ShoppingCartViewSet,
+                    TagViewSet)
 
 app_name = "api"
 router = DefaultRouter()
@@ -16,10 +17,22 @@ urlpatterns = [
         ShoppingCartViewSet.as_view({"post": "create", "delete": "destroy"}),
         name="shopping_cart",
     ),
+    path(
+        "recipes/shopping_cart/",
+        ShoppingCartViewSet.as_view(
+            {"post": "bulk_create", "delete": "bulk_destroy"}
+        ),
+        name="shopping_cart_bulk",
+    ),
     path(
         "recipes/download_shopping_cart/",
         DownloadShoppingCartView.as_view(),
         name="download_shopping_cart",
     ),
+    path(
+        "recipes/download_shopping_cart/<str:job_id>/",
+        ShoppingCartRenderJobView.as_view(),
+        name="download_shopping_cart_job",
+    ),
     path("", include(router.urls)),
 ]
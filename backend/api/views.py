@@ -1,32 +1,44 @@
-from core.html_to_pdf import html_to_pdf
-from core.models import Favorite, ShoppingList
+from core import pdf_jobs
+from core.exports import EXPORT_FORMATS, stream_shopping_list
+from core.html_to_pdf import pdf_response
+from core.mixins import CatalogCacheMixin, RecipeCacheMixin
+from core.models import Favorite, ShoppingList, ShoppingListTotal
 from core.paginators import CustomPagination
+from core.pdf_cache import cached_html_to_pdf
 from core.permissions import IsAuthorOrReadOnly
 from core.serializers import (
     FavoriteShoppingListSerializer,
+    ShoppingListBulkSerializer,
     ShoppingListCreateSerializer,
 )
-from django.db.models import Sum
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from recipes.autocomplete import fuzzy_search, ingredient_index
+from recipes.models import Ingredient, Recipe, Tag
 from recipes.serializers import (
-    IngredientSerializer,
+    IngredientValuesSerializer,
     RecipeCreateSerializer,
-    RecipeSerializer,
+    RecipeDocumentSerializer,
     TagSerializer,
 )
 from rest_framework import filters, mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
-from .filters import RecipeFilter
+from .filters import RecipeFilter, RecipeOrderingFilter
 
 
 class TagViewSet(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+    CatalogCacheMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
 ):
     """Вьюсет для:
     - получения списка тегов;
@@ -38,78 +50,264 @@ class TagViewSet(
 
 
 class IngredientViewSet(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+    CatalogCacheMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
 ):
     """Вьюсет для:
     - получения списка ингридиентов с возможностью поиска по имени;
     - получения информации о конкретном ингридиенте."""
 
-    queryset = Ingredient.objects.all()
+    queryset = Ingredient.objects.values(
+        *IngredientValuesSerializer.values_fields
+    )
     permission_classes = (AllowAny,)
-    serializer_class = IngredientSerializer
+    serializer_class = IngredientValuesSerializer
     filter_backends = (filters.SearchFilter,)
     search_fields = ("^name",)
 
+    def get_search_limit(self):
+        try:
+            limit = int(self.request.query_params["limit"])
+        except (KeyError, ValueError):
+            return settings.INGREDIENTS_SEARCH_LIMIT
+        return max(1, min(limit, settings.INGREDIENTS_SEARCH_MAX_LIMIT))
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.query_params.get(api_settings.SEARCH_PARAM):
+            return queryset[: self.get_search_limit()]
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        return self.catalog_response(request, self.search, *args, **kwargs)
+
+    def search(self, request, *args, **kwargs):
+        """Ищет по префиксу названия, а если ничего не найдено или передан
+        параметр fuzzy, ищет с учётом опечаток."""
+        name = request.query_params.get(api_settings.SEARCH_PARAM)
+        if not name:
+            return mixins.ListModelMixin.list(self, request, *args, **kwargs)
+        limit = self.get_search_limit()
+        if request.query_params.get("fuzzy") not in ("1", "true"):
+            if settings.INGREDIENTS_INDEX_ENABLED:
+                results = ingredient_index.search(name, limit)
+            else:
+                results = self.get_serializer(
+                    self.filter_queryset(self.get_queryset()), many=True
+                ).data
+            if results:
+                return Response(results)
+        return Response(fuzzy_search(name, limit))
+
 
 class ShoppingCartViewSet(viewsets.ViewSet):
     permission_classes = (IsAuthenticated,)
 
     def create(self, request, **kwargs):
-        recipe = get_object_or_404(Recipe, id=kwargs["recipe_id"])
-        serializer = ShoppingListCreateSerializer(
-            data={"recipe": recipe.id}, context={"request": request}
-        )
-        serializer.is_valid(raise_exception=True)
-        if not ShoppingList.objects.filter(
-            user=request.user, recipe=recipe
-        ).exists():
-            serializer.save(user=request.user)
+        with transaction.atomic():
+            shopping_list = ShoppingList.objects.add(
+                request.user.id, kwargs["recipe_id"]
+            )
+            if shopping_list is not None:
+                ShoppingListTotal.objects.add_recipes(
+                    request.user.id, [shopping_list.recipe_id]
+                )
+        if shopping_list is not None:
+            serializer = ShoppingListCreateSerializer(shopping_list)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
+        get_object_or_404(Recipe, id=kwargs["recipe_id"])
         return Response(
             {"errors": "Рецепт уже в списке покупок."},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
     def destroy(self, request, **kwargs):
-        recipe = get_object_or_404(Recipe, id=kwargs["recipe_id"])
-        shopping_list = get_object_or_404(
-            ShoppingList, user=request.user, recipe=recipe
-        )
-        shopping_list.delete()
+        with transaction.atomic():
+            removed = ShoppingList.objects.remove(
+                request.user.id, kwargs["recipe_id"]
+            )
+            if removed:
+                ShoppingListTotal.objects.remove_recipes(
+                    request.user.id, [kwargs["recipe_id"]]
+                )
+        if not removed:
+            raise Http404
         return Response(
             {"detail": "Рецепт удален из списка покупок."},
             status=status.HTTP_204_NO_CONTENT,
         )
 
+    def bulk_create(self, request):
+        """Добавляет в список покупок несколько рецептов за один запрос."""
+        serializer = ShoppingListBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+        user = request.user
+        found = set(
+            Recipe.objects.filter(id__in=ids).values_list("id", flat=True)
+        )
+        with transaction.atomic():
+            added = set(ShoppingList.objects.add_many(user.id, ids))
+            ShoppingListTotal.objects.add_recipes(user.id, added)
+        return Response(
+            [
+                {
+                    "id": recipe_id,
+                    "status": (
+                        "not_found"
+                        if recipe_id not in found
+                        else "added"
+                        if recipe_id in added
+                        else "already_in_cart"
+                    ),
+                }
+                for recipe_id in ids
+            ],
+            status=status.HTTP_200_OK,
+        )
+
+    def bulk_destroy(self, request):
+        """Удаляет из списка покупок несколько рецептов за один запрос."""
+        serializer = ShoppingListBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+        user = request.user
+        with transaction.atomic():
+            removed = set(ShoppingList.objects.remove_many(user.id, ids))
+            ShoppingListTotal.objects.remove_recipes(user.id, removed)
+        return Response(
+            [
+                {
+                    "id": recipe_id,
+                    "status": (
+                        "removed" if recipe_id in removed else "not_in_cart"
+                    ),
+                }
+                for recipe_id in ids
+            ],
+            status=status.HTTP_200_OK,
+        )
+
 
 class DownloadShoppingCartView(APIView):
+    """Вью для:
+    - скачивания списка покупок в PDF (GET);
+    - скачивания списка покупок в txt, csv или json (GET с ?format=);
+    - запуска фонового рендеринга PDF (POST), возвращает id задачи."""
+
     permission_classes = (IsAuthenticated,)
+    template = "html_to_pdf.html"
+
+    def perform_content_negotiation(self, request, force=False):
+        # Параметр format выбирает формат файла, а не рендерер DRF.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get_queryset(self, user):
+        return (
+            ShoppingListTotal.objects.filter(user=user)
+            .values(
+                "ingredient__name", "ingredient__measurement_unit", "total"
+            )
+            .order_by("ingredient__name", "ingredient__measurement_unit")
+        )
+
+    def get_rows(self, user):
+        return list(self.get_queryset(user))
 
     def get(self, request):
         user = request.user
-        context = (
-            IngredientRecipe.objects.filter(recipe__shopping_list__user=user)
-            .values("ingredient__name", "ingredient__measurement_unit")
-            .annotate(total=Sum("amount"))
+        export_format = request.query_params.get("format", "pdf")
+        if export_format in EXPORT_FORMATS:
+            return stream_shopping_list(
+                self.get_queryset(user).iterator(), export_format
+            )
+        if export_format != "pdf":
+            return Response(
+                {"errors": f"Неизвестный формат: {export_format}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return cached_html_to_pdf(
+            self.template, self.get_rows(user), user.id
         )
-        return html_to_pdf("html_to_pdf.html", {"context": context})
 
+    def post(self, request):
+        user = request.user
+        try:
+            job_id = pdf_jobs.submit(
+                user.id, self.template, self.get_rows(user)
+            )
+        except pdf_jobs.QueueFullError:
+            return Response(
+                {"errors": "Слишком много запросов, попробуйте позже."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        job = pdf_jobs.get_job(job_id, user.id)
+        return Response(
+            {"id": job_id, "status": job["status"]},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class ShoppingCartRenderJobView(APIView):
+    """Вью для получения PDF, отрендеренного в фоне.
+
+    Параметр wait задаёт, сколько секунд ждать готовности файла."""
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, job_id):
+        try:
+            timeout = float(request.query_params.get("wait", 0))
+        except ValueError:
+            timeout = 0
+        timeout = max(0, min(timeout, settings.SHOPPING_LIST_PDF_MAX_WAIT))
+        job = pdf_jobs.get_job(job_id, request.user.id, timeout)
+        if job is None:
+            raise Http404
+        if job["status"] == pdf_jobs.FAILED:
+            return Response(
+                {"id": job_id, "status": job["status"]},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        if job["status"] == pdf_jobs.DONE:
+            content = pdf_jobs.get_content(job_id)
+            if content is not None:
+                return pdf_response(content)
+        # Готовый файл ещё не виден или уже вытеснен: клиент повторяет
+        # запрос, пока задача не истечёт.
+        return Response(
+            {"id": job_id, "status": pdf_jobs.PENDING},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class RecipeViewSet(RecipeCacheMixin, viewsets.ModelViewSet):
     """ffffffff."""
 
     queryset = Recipe.objects.all()
     pagination_class = CustomPagination
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ("id", "favorites_count")
+    ordering = ("-id",)
     http_method_names = ["get", "post", "patch", "create", "delete"]
+    lookup_value_regex = r"\d+"
+
+    def get_queryset(self):
+        if self.action in ("list", "retrieve"):
+            return Recipe.objects.with_document().with_user_flags(
+                self.request.user
+            )
+        return super().get_queryset()
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     def get_serializer_class(self):
         if self.action in ("list", "retrieve"):
-            return RecipeSerializer
+            return RecipeDocumentSerializer
         return RecipeCreateSerializer
 
     def get_permissions(self):
@@ -126,24 +324,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def favorite(self, request, pk):
         if request.method == "POST":
-            if Favorite.objects.filter(
-                user=request.user, recipe__id=pk
-            ).exists():
+            favorite = Favorite.objects.add(request.user.id, pk)
+            if favorite is None:
+                get_object_or_404(Recipe, id=pk)
                 return Response(
                     {"errors": "Рецепт уже добавлен!"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            recipe = get_object_or_404(Recipe, id=pk)
-            Favorite.objects.create(user=request.user, recipe=recipe)
-            serializer = FavoriteShoppingListSerializer(recipe)
+            serializer = FavoriteShoppingListSerializer(favorite.recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        else:
-            obj = Favorite.objects.filter(user=request.user, recipe__id=pk)
-            if obj.exists():
-                obj.delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response(
-                {"errors": "Рецепт удален."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        if Favorite.objects.remove(request.user.id, pk):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(
+            {"errors": "Рецепт удален."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
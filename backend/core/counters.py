@@ -0,0 +1,36 @@
+import threading
+
+
+class CounterFieldsMixin:
+    """Исключает счётчики из обычного сохранения модели.
+
+    Счётчики меняются только выражениями F() и UPDATE, поэтому save()
+    существующего объекта не должен записывать загруженные вместе с ним,
+    возможно устаревшие, значения.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+_deleting = threading.local()
+
+
+def deleting_ids(model):
+    """pk объектов model, которые сейчас удаляются в этом потоке.
+
+    Пока удаляется рецепт или пользователь, построчные обработчики
+    каскадно удаляемых связей не обновляют счётчики: они либо относятся к
+    удаляемой строке, либо уже уменьшены одним запросом.
+    """
+    marks = _deleting.__dict__.setdefault("marks", {})
+    return marks.setdefault(model._meta.label, set())
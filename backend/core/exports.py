@@ -0,0 +1,68 @@
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+
+
+class Echo:
+    """Файлоподобный объект, который возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def export_txt(rows):
+    for row in rows:
+        yield (
+            f"{row['ingredient__name']} "
+            f"({row['ingredient__measurement_unit']}) — {row['total']}\n"
+        )
+
+
+def export_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(("name", "measurement_unit", "amount"))
+    for row in rows:
+        yield writer.writerow(
+            (
+                row["ingredient__name"],
+                row["ingredient__measurement_unit"],
+                row["total"],
+            )
+        )
+
+
+def export_json(rows):
+    separator = ""
+    yield "["
+    for row in rows:
+        item = json.dumps(
+            {
+                "name": row["ingredient__name"],
+                "measurement_unit": row["ingredient__measurement_unit"],
+                "amount": row["total"],
+            },
+            ensure_ascii=False,
+        )
+        yield f"{separator}{item}"
+        separator = ","
+    yield "]"
+
+
+EXPORT_FORMATS = {
+    "txt": (export_txt, "text/plain; charset=utf-8"),
+    "csv": (export_csv, "text/csv; charset=utf-8"),
+    "json": (export_json, "application/json"),
+}
+
+
+def stream_shopping_list(rows, export_format):
+    """Отдаёт список покупок потоком, не загружая его целиком в память."""
+    generator, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(
+        generator(rows), content_type=content_type
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="shopping_cart.{export_format}"'
+    )
+    return response
@@ -1,3 +1,4 @@
+import io
 import os
 import sys
 
@@ -7,6 +8,8 @@ from django.template.loader import get_template
 from xhtml2pdf import pisa
 from xhtml2pdf.files import pisaFileObject
 
+from .native_pdf import render_native_pdf
+
 
 def link_callback(uri, rel):
     """
@@ -24,20 +27,41 @@ def link_callback(uri, rel):
     return path or None
 
 
-def html_to_pdf(template, context):
-    """Преобразует html-страницу с информацией из базы данных в PDF-файл."""
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = 'filename="shopping_cart.pdf"'
-    template = get_template(template)
-    html = template.render(context)
+def render_pdf(template, context, renderer=None):
+    """Рендерит список покупок в содержимое PDF-файла.
+
+    Рендерер "html" строит PDF из html-шаблона через xhtml2pdf, "native"
+    рисует ту же таблицу напрямую через reportlab. По умолчанию
+    используется settings.SHOPPING_LIST_PDF_RENDERER.
+    """
+    renderer = renderer or settings.SHOPPING_LIST_PDF_RENDERER
+    if renderer == "native":
+        return render_native_pdf(context["context"])
+    html = get_template(template).render(context)
     if sys.platform == "win32":
         pisaFileObject.getNamedFile = (
             lambda self: settings.STATIC_ROOT
             + self.uri.replace(settings.STATIC_URL, "\\")
         )
+    result = io.BytesIO()
     pdf = pisa.CreatePDF(
-        html, dest=response, encoding="utf-8", link_callback=link_callback
+        html, dest=result, encoding="utf-8", link_callback=link_callback
     )
-    if not pdf.err:
-        return response
-    return None
+    if pdf.err:
+        return None
+    return result.getvalue()
+
+
+def pdf_response(content):
+    """Отдаёт готовый PDF-файл списка покупок."""
+    response = HttpResponse(content, content_type="application/pdf")
+    response["Content-Disposition"] = 'filename="shopping_cart.pdf"'
+    return response
+
+
+def html_to_pdf(template, context):
+    """Преобразует html-страницу с информацией из базы данных в PDF-файл."""
+    content = render_pdf(template, context)
+    if content is None:
+        return None
+    return pdf_response(content)
@@ -0,0 +1,67 @@
+import time
+import tracemalloc
+
+from core.html_to_pdf import render_pdf
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнение скорости и пикового потребления памяти рендереров "
+        "PDF списка покупок."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[10, 100, 1000],
+            help="Количество строк в списке покупок.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Количество замеров времени для каждого варианта.",
+        )
+
+    def make_rows(self, count):
+        return [
+            {
+                "ingredient__name": f"ингредиент номер {number}",
+                "ingredient__measurement_unit": "г",
+                "total": number * 10,
+            }
+            for number in range(count)
+        ]
+
+    def measure(self, renderer, rows, repeat):
+        context = {"context": rows}
+        render_pdf("html_to_pdf.html", context, renderer)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            content = render_pdf("html_to_pdf.html", context, renderer)
+            timings.append(time.perf_counter() - started)
+        tracemalloc.start()
+        render_pdf("html_to_pdf.html", context, renderer)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return min(timings), peak, len(content)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'строк':>6} {'рендерер':>8} {'время, мс':>10} "
+            f"{'память, КБ':>11} {'размер, КБ':>11}"
+        )
+        for count in options["rows"]:
+            rows = self.make_rows(count)
+            for renderer in ("html", "native"):
+                elapsed, peak, size = self.measure(
+                    renderer, rows, options["repeat"]
+                )
+                self.stdout.write(
+                    f"{count:>6} {renderer:>8} {elapsed * 1000:>10.1f} "
+                    f"{peak / 1024:>11.0f} {size / 1024:>11.1f}"
+                )
@@ -0,0 +1,266 @@
+import random
+import re
+import time
+import uuid
+
+from api.filters import RecipeFilter
+from core.models import Favorite, ShoppingList, ShoppingListTotal
+from django.core.management import BaseCommand
+from django.db import connection, models, transaction
+from django.db.models import Sum
+from django.http import QueryDict
+from recipes.catalog import bump_catalog_version
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag, TagRecipe
+from users.models import Follow, User
+
+# Индексы и ограничения аудита, а также индексы внешних ключей, которые
+# они заменили. Для замера "до" первые удаляются, а вторые создаются.
+AUDIT = (
+    (IngredientRecipe, "unique_ingredient_recipe", "recipe"),
+    (TagRecipe, "unique_tag_recipe", "tag"),
+    (Favorite, "favorite_recipe_user_idx", "recipe"),
+    (ShoppingList, "shoppinglist_recipe_user_idx", "recipe"),
+    (Follow, "follow_author_user_idx", "author"),
+)
+EXECUTION_TIME = re.compile(r"Execution Time: ([\d.]+) ms")
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполнение базы тестовыми данными и замер запросов эндпоинтов "
+        "через EXPLAIN ANALYZE с индексами аудита и без них. "
+        "Все изменения откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=1000, help="Количество авторов."
+        )
+        parser.add_argument(
+            "--recipes", type=int, default=20000, help="Количество рецептов."
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Количество замеров для каждого запроса.",
+        )
+
+    def seed(self, options):
+        token = uuid.uuid4().hex[:8]
+        rng = random.Random(token)
+        batch_size = 5000
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f"bench_{token}_{number}",
+                    email=f"bench_{token}_{number}@example.com",
+                    password="!",
+                )
+                for number in range(options["users"])
+            ),
+            batch_size=batch_size,
+        )
+        users = list(
+            User.objects.filter(username__startswith=f"bench_{token}_")
+            .values_list("id", flat=True)
+        )
+        colors = set(Tag.objects.values_list("color", flat=True))
+        free_colors = (
+            color
+            for color in (f"#{number:06x}" for number in range(1, 0xFFFFFF))
+            if color not in colors
+        )
+        Tag.objects.bulk_create(
+            Tag(
+                name=f"bench_{token}_{number}",
+                slug=f"bench_{token}_{number}",
+                color=next(free_colors),
+            )
+            for number in range(10)
+        )
+        tags = list(Tag.objects.filter(slug__startswith=f"bench_{token}_"))
+        bump_catalog_version()
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(
+                    name=f"bench_{token}_{number}", measurement_unit="г"
+                )
+                for number in range(2000)
+            ),
+            batch_size=batch_size,
+        )
+        ingredients = list(
+            Ingredient.objects.filter(name__startswith=f"bench_{token}_")
+            .values_list("id", flat=True)
+        )
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=rng.choice(users),
+                    name=f"bench_{token}_{number}",
+                    text="",
+                    image="recipes/images/bench.png",
+                    cooking_time=rng.randint(1, 120),
+                )
+                for number in range(options["recipes"])
+            ),
+            batch_size=batch_size,
+        )
+        recipes = list(
+            Recipe.objects.filter(name__startswith=f"bench_{token}_")
+            .values_list("id", flat=True)
+        )
+        IngredientRecipe.objects.bulk_create(
+            (
+                IngredientRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe_id in recipes
+                for ingredient_id in rng.sample(ingredients, 8)
+            ),
+            batch_size=batch_size,
+        )
+        TagRecipe.objects.bulk_create(
+            (
+                TagRecipe(recipe_id=recipe_id, tag_id=tag.id)
+                for recipe_id in recipes
+                for tag in rng.sample(tags, 2)
+            ),
+            batch_size=batch_size,
+        )
+        for model, count in ((Favorite, 20), (ShoppingList, 5)):
+            model.objects.bulk_create(
+                (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in users
+                    for recipe_id in rng.sample(recipes, count)
+                ),
+                batch_size=batch_size,
+            )
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id in users
+                for author_id in rng.sample(users, 6)
+                if author_id != user_id
+            ),
+            batch_size=batch_size,
+        )
+        ShoppingListTotal.objects.add_recipes(
+            users[0],
+            ShoppingList.objects.filter(user_id=users[0]).values_list(
+                "recipe_id", flat=True
+            ),
+        )
+        return User.objects.get(pk=users[0]), tags, recipes[:6]
+
+    def get_queries(self, user, tags, recipe_ids):
+        tag_query = QueryDict(mutable=True)
+        tag_query.setlist("tags", [tag.slug for tag in tags[:2]])
+        return {
+            "GET /recipes/": Recipe.objects.with_user_flags(user)[:6],
+            "GET /recipes/?tags=": RecipeFilter(
+                tag_query, queryset=Recipe.objects.with_user_flags(user)
+            ).qs[:6],
+            "GET /recipes/?is_favorited=1": Recipe.objects.with_user_flags(
+                user
+            ).filter(is_favorited=True)[:6],
+            "GET /recipes/?is_in_shopping_cart=1": (
+                Recipe.objects.with_user_flags(user).filter(
+                    is_in_shopping_cart=True
+                )[:6]
+            ),
+            "prefetch ingredients": IngredientRecipe.objects.filter(
+                recipe_id__in=recipe_ids
+            ).select_related("ingredient"),
+            "prefetch tags": Tag.objects.filter(
+                tagrecipe__recipe_id__in=recipe_ids
+            ),
+            "POST /shopping_cart/ totals": IngredientRecipe.objects.filter(
+                recipe_id__in=recipe_ids
+            )
+            .values_list("ingredient_id")
+            .annotate(amount=Sum("amount"))
+            .order_by(),
+            "DELETE /recipes/{id}/ cart users": ShoppingList.objects.filter(
+                recipe_id=recipe_ids[0]
+            ).values_list("user_id", flat=True),
+            "DELETE /recipes/{id}/ favorites": Favorite.objects.filter(
+                recipe_id=recipe_ids[0]
+            ).values_list("id", flat=True),
+            "GET /download_shopping_cart/": ShoppingListTotal.objects.filter(
+                user=user
+            ).values("ingredient__name", "ingredient__measurement_unit"),
+            "GET /users/subscriptions/": User.objects.filter(
+                following__user=user
+            )[:6],
+            "author followers": Follow.objects.filter(
+                author=user
+            ).values_list("user_id", flat=True),
+        }
+
+    def measure(self, queryset, repeat):
+        """Минимальное время выполнения запроса в миллисекундах."""
+        timings = []
+        for _ in range(repeat):
+            if connection.vendor == "postgresql":
+                plan = queryset.explain(analyze=True)
+                timings.append(float(EXECUTION_TIME.search(plan).group(1)))
+            else:
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
+
+    def drop_audit_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, name, field in AUDIT:
+                for constraint in model._meta.constraints:
+                    if constraint.name == name:
+                        editor.remove_constraint(model, constraint)
+                for index in model._meta.indexes:
+                    if index.name == name:
+                        editor.remove_index(model, index)
+                editor.add_index(
+                    model,
+                    models.Index(
+                        fields=[field], name=f"bench_{name}"[:30]
+                    ),
+                )
+            editor.execute("ANALYZE")
+
+    def handle(self, *args, **options):
+        is_postgresql = connection.vendor == "postgresql"
+        if not is_postgresql:
+            self.stdout.write(
+                self.style.WARNING(
+                    "EXPLAIN ANALYZE и замер без индексов доступны только "
+                    "для PostgreSQL, выводится время выполнения с текущими "
+                    "индексами."
+                )
+            )
+        with transaction.atomic():
+            queries = self.get_queries(*self.seed(options))
+            if is_postgresql:
+                connection.cursor().execute("ANALYZE")
+            after = {
+                name: self.measure(queryset, options["repeat"])
+                for name, queryset in queries.items()
+            }
+            before = {}
+            if is_postgresql:
+                self.drop_audit_indexes()
+                before = {
+                    name: self.measure(queryset, options["repeat"])
+                    for name, queryset in queries.items()
+                }
+            transaction.set_rollback(True)
+        bump_catalog_version()
+
+        self.stdout.write(f"{'запрос':<40} {'до, мс':>10} {'после, мс':>10}")
+        for name, timing in after.items():
+            previous = f"{before[name]:.3f}" if name in before else "-"
+            self.stdout.write(f"{name:<40} {previous:>10} {timing:>10.3f}")
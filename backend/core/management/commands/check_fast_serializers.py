@@ -0,0 +1,97 @@
+from core.renderers import FastJSONRenderer
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand, CommandError
+from django.test import RequestFactory
+from recipes.models import Ingredient, Recipe
+from recipes.serializers import (IngredientSerializer,
+                                 IngredientValuesSerializer,
+                                 RecipeDocumentSerializer, RecipeSerializer)
+from rest_framework.renderers import JSONRenderer
+from users.models import User
+from users.serializers import UsersListSerializer, UsersListValuesSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверка побайтового совпадения ответов быстрых сериализаторов "
+        "и FastJSONRenderer с обычными сериализаторами DRF."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="id пользователя, от имени которого строятся ответы.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=100,
+            help="Количество объектов каждого типа.",
+        )
+
+    def get_request(self, user_id):
+        request = RequestFactory().get("/", HTTP_HOST="localhost")
+        request.user = AnonymousUser()
+        if user_id is not None:
+            try:
+                request.user = User.objects.get(pk=user_id)
+            except User.DoesNotExist:
+                raise CommandError(f"Пользователь {user_id} не найден.")
+        return request
+
+    def get_pairs(self, request, limit):
+        """Пары (обычный ответ, быстрый ответ) для каждого эндпоинта."""
+        user = request.user
+        context = {"request": request}
+        recipes = Recipe.objects.with_user_flags(user)[:limit]
+        users = User.objects.order_by("id")[:limit]
+        ingredients = Ingredient.objects.all()[:limit]
+        return {
+            "recipes": (
+                RecipeSerializer(recipes, many=True, context=context),
+                RecipeDocumentSerializer(
+                    Recipe.objects.with_document().with_user_flags(user)[
+                        :limit
+                    ],
+                    many=True,
+                    context=context,
+                ),
+            ),
+            "users": (
+                UsersListSerializer(users, many=True, context=context),
+                UsersListValuesSerializer(
+                    users.values(*UsersListValuesSerializer.values_fields),
+                    many=True,
+                    context=context,
+                ),
+            ),
+            "ingredients": (
+                IngredientSerializer(ingredients, many=True, context=context),
+                IngredientValuesSerializer(
+                    ingredients.values(
+                        *IngredientValuesSerializer.values_fields
+                    ),
+                    many=True,
+                    context=context,
+                ),
+            ),
+        }
+
+    def handle(self, *args, **options):
+        request = self.get_request(options["user"])
+        pairs = self.get_pairs(request, options["limit"])
+        mismatches = []
+        for name, (serializer, fast_serializer) in pairs.items():
+            expected = JSONRenderer().render(serializer.data)
+            actual = FastJSONRenderer().render(fast_serializer.data)
+            if expected != actual:
+                mismatches.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: не совпадает."))
+            else:
+                self.stdout.write(f"{name}: {len(expected)} байт, совпадает.")
+        if mismatches:
+            raise CommandError(
+                f"Ответы различаются: {', '.join(mismatches)}."
+            )
+        self.stdout.write(self.style.SUCCESS("Ответы совпадают."))
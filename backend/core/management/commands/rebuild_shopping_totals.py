@@ -0,0 +1,60 @@
+from core.models import ShoppingListTotal
+from django.core.management import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверка и пересборка сумм ингредиентов в списках покупок "
+        "по фактическому содержимому списков."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только сообщить о расхождениях, ничего не меняя.",
+        )
+
+    def handle(self, *args, **options):
+        actual = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total in (
+                ShoppingListTotal.objects.actual().iterator()
+            )
+        }
+        stored = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total in (
+                ShoppingListTotal.objects.values_list(
+                    "user_id", "ingredient_id", "total"
+                ).iterator()
+            )
+        }
+        drift = {
+            key
+            for key in actual.keys() | stored.keys()
+            if actual.get(key) != stored.get(key)
+        }
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Расхождений нет."))
+            return
+        self.stdout.write(
+            self.style.WARNING(f"Найдено расхождений: {len(drift)}.")
+        )
+        if options["check"]:
+            return
+        with transaction.atomic():
+            ShoppingListTotal.objects.all().delete()
+            ShoppingListTotal.objects.bulk_create(
+                (
+                    ShoppingListTotal(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total=total,
+                    )
+                    for (user_id, ingredient_id), total in actual.items()
+                ),
+                batch_size=1000,
+            )
+        self.stdout.write(self.style.SUCCESS("Суммы пересобраны."))
@@ -0,0 +1,71 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Recipe
+from users.models import User
+
+# Счётчик и обратная связь, по которой он считается.
+COUNTERS = (
+    (Recipe, "favorites_count", "favorite"),
+    (Recipe, "in_carts_count", "shopping_list"),
+    (User, "recipes_count", "recipe"),
+    (User, "followers_count", "following"),
+)
+
+
+def actual_count(model, relation):
+    """Подзапрос с фактическим количеством связанных записей."""
+    related = model._meta.get_field(relation)
+    field = related.field.name
+    return Coalesce(
+        Subquery(
+            related.related_model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверка и пересчёт счётчиков избранного, списков покупок, "
+        "рецептов и подписчиков."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только сообщить о расхождениях, ничего не меняя.",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, field, relation in COUNTERS:
+            drift = (
+                model.objects.annotate(actual=actual_count(model, relation))
+                .exclude(**{field: F("actual")})
+                .values_list("pk", flat=True)
+            )
+            with transaction.atomic():
+                ids = list(drift)
+                if ids and not options["check"]:
+                    model.objects.filter(pk__in=ids).update(
+                        **{field: actual_count(model, relation)}
+                    )
+            if ids:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{model._meta.label}.{field}: "
+                        f"расхождений {len(ids)}."
+                    )
+                )
+            total += len(ids)
+        if not total:
+            self.stdout.write(self.style.SUCCESS("Расхождений нет."))
+        elif not options["check"]:
+            self.stdout.write(self.style.SUCCESS("Счётчики пересчитаны."))
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def fill_shopping_totals(apps, schema_editor):
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingListTotal = apps.get_model('core', 'ShoppingListTotal')
+    rows = (
+        IngredientRecipe.objects.filter(recipe__shopping_list__isnull=False)
+        .values_list('recipe__shopping_list__user', 'ingredient')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    ShoppingListTotal.objects.bulk_create(
+        (
+            ShoppingListTotal(
+                user_id=user_id, ingredient_id=ingredient_id, total=total
+            )
+            for user_id, ingredient_id, total in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_ingredient_name_trgm'),
+        ('core', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0, verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_totals', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_totals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Сумма в списке покупок',
+                'verbose_name_plural': 'Суммы в списках покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglisttotal',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_total'),
+        ),
+        migrations.RunPython(fill_shopping_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,160 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from django.http import HttpResponse, HttpResponseNotModified
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, quote_etag
+from recipes.catalog import get_catalog_version
+from recipes.models import Recipe
+from rest_framework.response import Response
+from users.models import Follow
+
+
+class CatalogCacheMixin:
+    """Условные запросы и кеширование ответов для справочников.
+
+    ETag строится из версии справочника и полного пути запроса, поэтому
+    любое изменение тегов или ингредиентов делает старые ETag
+    недействительными. Отрендеренные JSON-ответы хранятся в кеше и
+    отдаются без обращения к базе данных.
+    """
+
+    catalog_cached_actions = ("list", "retrieve")
+
+    def get_catalog_etag(self, request):
+        if (
+            self.action not in self.catalog_cached_actions
+            or request.accepted_renderer.format != "json"
+        ):
+            return None
+        key = f"{get_catalog_version()}:{request.get_full_path()}"
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def catalog_response(self, request, handler, *args, **kwargs):
+        self.catalog_etag = self.get_catalog_etag(request)
+        if self.catalog_etag is None:
+            return handler(request, *args, **kwargs)
+        if self.catalog_etag in parse_etags(
+            request.META.get("HTTP_IF_NONE_MATCH", "")
+        ):
+            return HttpResponseNotModified()
+        cached = cache.get(f"catalog:{self.catalog_etag}")
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        return handler(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.catalog_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.catalog_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        etag = getattr(self, "catalog_etag", None)
+        if etag is None or response.status_code not in (200, 304):
+            return response
+        if isinstance(response, Response):
+            response.render()
+            cache.set(
+                f"catalog:{etag}",
+                (response.content, response["Content-Type"]),
+                settings.CATALOG_CACHE_TIMEOUT,
+            )
+        response["ETag"] = etag
+        patch_cache_control(
+            response, public=True, max_age=settings.CATALOG_CACHE_MAX_AGE
+        )
+        patch_vary_headers(response, ("Accept",))
+        return response
+
+
+class RecipeCacheMixin:
+    """Условные запросы и кеширование карточки рецепта.
+
+    ETag строится из даты изменения рецепта, профиля автора, версии
+    справочников, счётчиков и флагов текущего пользователя. Общая для всех
+    часть ответа хранится в кеше, а флаги и счётчики подставляются в неё
+    при каждом запросе.
+    """
+
+    recipe_state_fields = (
+        "favorites_count",
+        "in_carts_count",
+        "is_favorited",
+        "is_in_shopping_cart",
+    )
+    author_profile_fields = ("email", "username", "first_name", "last_name")
+    author_state_fields = ("recipes_count", "followers_count")
+
+    def get_recipe_state(self, request):
+        user = request.user
+        is_subscribed = (
+            Exists(Follow.objects.filter(user=user, author=OuterRef("author")))
+            if user.is_authenticated
+            else Value(False, output_field=BooleanField())
+        )
+        return get_object_or_404(
+            Recipe.objects.with_user_flags(user)
+            .annotate(is_subscribed=is_subscribed)
+            .values(
+                "id",
+                "updated_at",
+                *self.recipe_state_fields,
+                "is_subscribed",
+                *(
+                    f"author__{field}"
+                    for field in self.author_profile_fields
+                    + self.author_state_fields
+                ),
+            ),
+            pk=self.kwargs[self.lookup_url_kwarg or self.lookup_field],
+        )
+
+    def get_recipe_data(self, request, state, version):
+        author = ":".join(
+            state[f"author__{field}"] for field in self.author_profile_fields
+        )
+        key = (
+            f"{state['id']}:{state['updated_at'].isoformat()}:{version}:"
+            f"{author}:{request.scheme}://{request.get_host()}"
+        )
+        key = f"recipe:{hashlib.md5(key.encode()).hexdigest()}"
+        data = cache.get(key)
+        if data is None:
+            data = self.get_serializer(self.get_object()).data
+            cache.set(key, data, settings.RECIPE_CACHE_TIMEOUT)
+        data.update(
+            (field, state[field]) for field in self.recipe_state_fields
+        )
+        data["author"]["is_subscribed"] = state["is_subscribed"]
+        data["author"].update(
+            (field, state[f"author__{field}"])
+            for field in self.author_state_fields
+        )
+        return data
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != "json":
+            return super().retrieve(request, *args, **kwargs)
+        state = self.get_recipe_state(request)
+        version = get_catalog_version()
+        etag = ":".join(str(value) for value in (version, *state.values()))
+        etag = quote_etag(hashlib.md5(etag.encode()).hexdigest())
+        if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponseNotModified()
+        else:
+            response = Response(self.get_recipe_data(request, state, version))
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(state["updated_at"].timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ("Accept", "Authorization", "Cookie"))
+        return response
@@ -1,7 +1,148 @@
-from django.db import models
-from recipes.models import Recipe
+from django.db import connections, models, transaction
+from django.db.models import Case, F, Sum, Value, When
+from recipes.models import Ingredient, IngredientRecipe, Recipe
 from users.models import User
 
+from .pdf_cache import pdf_cache
+
+
+class UserRecipeQuerySet(models.QuerySet):
+    """Добавление и удаление рецепта пользователя одним запросом.
+
+    Вставка выполняется через INSERT ... ON CONFLICT DO NOTHING RETURNING,
+    поэтому одновременные повторные запросы не приводят к IntegrityError.
+    Вместе с записью меняется счётчик рецепта counter_field модели.
+    """
+
+    # Порядок полей совпадает с порядком в модели, как ожидает from_db.
+    recipe_fields = ("id", "image", "name", "cooking_time")
+
+    def update_counter(self, recipe_ids, delta):
+        """Меняет счётчик рецептов recipe_ids на delta одним UPDATE."""
+        field = self.model.counter_field
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            **{field: F(field) + delta}
+        )
+
+    def changed(self, user_id):
+        """Записи меняются SQL-запросами без сигналов, поэтому кеш PDF
+        списка покупок пользователя сбрасывается здесь."""
+        if self.model.invalidates_pdf_cache:
+            pdf_cache.invalidate_user(user_id)
+
+    def add(self, user_id, recipe_id):
+        """Возвращает созданную запись с подгруженным рецептом или None,
+        если запись уже есть или рецепта не существует."""
+        connection = connections[self.db]
+        table = self.model._meta.db_table
+        recipes = Recipe._meta.db_table
+        counter = self.model.counter_field
+        insert = (
+            f"INSERT INTO {table} (user_id, recipe_id) "
+            f"SELECT %s, id FROM {recipes} WHERE id = %s "
+            "ON CONFLICT DO NOTHING RETURNING id, recipe_id"
+        )
+        columns = ", ".join(f"recipe.{field}" for field in self.recipe_fields)
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    f"WITH inserted AS ({insert}) "
+                    f"UPDATE {recipes} recipe "
+                    f"SET {counter} = recipe.{counter} + 1 FROM inserted "
+                    "WHERE recipe.id = inserted.recipe_id "
+                    f"RETURNING inserted.id, {columns}",
+                    (user_id, recipe_id),
+                )
+                row = cursor.fetchone()
+            else:
+                cursor.execute(insert, (user_id, recipe_id))
+                row = cursor.fetchone()
+                if row is not None:
+                    self.update_counter([recipe_id], 1)
+                    cursor.execute(
+                        f"SELECT {columns} FROM {recipes} recipe "
+                        "WHERE recipe.id = %s",
+                        (recipe_id,),
+                    )
+                    row = (row[0], *cursor.fetchone())
+        if row is None:
+            return None
+        self.changed(user_id)
+        instance = self.model(id=row[0], user_id=user_id, recipe_id=row[1])
+        instance.recipe = Recipe.from_db(self.db, self.recipe_fields, row[1:])
+        return instance
+
+    def remove(self, user_id, recipe_id):
+        """Удаляет запись одним DELETE ... RETURNING, сообщая, была ли она."""
+        connection = connections[self.db]
+        delete = (
+            f"DELETE FROM {self.model._meta.db_table} "
+            "WHERE user_id = %s AND recipe_id = %s RETURNING recipe_id"
+        )
+        counter = self.model.counter_field
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    f"WITH deleted AS ({delete}) "
+                    f"UPDATE {Recipe._meta.db_table} recipe "
+                    f"SET {counter} = recipe.{counter} - 1 FROM deleted "
+                    "WHERE recipe.id = deleted.recipe_id RETURNING recipe.id",
+                    (user_id, recipe_id),
+                )
+                removed = cursor.fetchone() is not None
+            else:
+                cursor.execute(delete, (user_id, recipe_id))
+                removed = cursor.fetchone() is not None
+                if removed:
+                    self.update_counter([recipe_id], -1)
+        if removed:
+            self.changed(user_id)
+        return removed
+
+    def add_many(self, user_id, recipe_ids):
+        """Добавляет несколько рецептов одним INSERT ... RETURNING и
+        возвращает id рецептов, для которых запись действительно создана."""
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return []
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        connection = connections[self.db]
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.model._meta.db_table} "
+                "(user_id, recipe_id) "
+                f"SELECT %s, id FROM {Recipe._meta.db_table} "
+                f"WHERE id IN ({placeholders}) "
+                "ON CONFLICT DO NOTHING RETURNING recipe_id",
+                (user_id, *recipe_ids),
+            )
+            added = [row[0] for row in cursor.fetchall()]
+            self.update_counter(added, 1)
+        if added:
+            self.changed(user_id)
+        return added
+
+    def remove_many(self, user_id, recipe_ids):
+        """Удаляет несколько рецептов одним DELETE ... RETURNING и
+        возвращает id рецептов, записи которых действительно удалены."""
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return []
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        connection = connections[self.db]
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.model._meta.db_table} "
+                f"WHERE user_id = %s AND recipe_id IN ({placeholders}) "
+                "RETURNING recipe_id",
+                (user_id, *recipe_ids),
+            )
+            removed = [row[0] for row in cursor.fetchall()]
+            self.update_counter(removed, -1)
+        if removed:
+            self.changed(user_id)
+        return removed
+
 
 class Favorite(models.Model):
     """Модель избранных рецептов."""
@@ -17,8 +158,13 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name="favorite",
         verbose_name="Избранный рецепт",
+        db_index=False,
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+    counter_field = "favorites_count"
+    invalidates_pdf_cache = False
+
     class Meta:
         verbose_name = "Список избранных рецептов"
         verbose_name_plural = "Списки избранных рецептов"
@@ -28,6 +174,11 @@ class Favorite(models.Model):
                 fields=["user", "recipe"], name="unique_favorites"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["recipe", "user"], name="favorite_recipe_user_idx"
+            ),
+        ]
 
     def __str__(self):
         return (
@@ -50,8 +201,13 @@ class ShoppingList(models.Model):
         on_delete=models.CASCADE,
         related_name="shopping_list",
         verbose_name="Список покупок",
+        db_index=False,
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+    counter_field = "in_carts_count"
+    invalidates_pdf_cache = True
+
     class Meta:
         verbose_name = "Список покупок"
         verbose_name_plural = "Списки покупок"
@@ -61,6 +217,12 @@ class ShoppingList(models.Model):
                 fields=["user", "recipe"], name="unique_shoppinglist"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["recipe", "user"],
+                name="shoppinglist_recipe_user_idx",
+            ),
+        ]
 
     def __str__(self):
         ingredients_list = ", ".join(
@@ -70,3 +232,106 @@ class ShoppingList(models.Model):
             f"{self.user.username} планирует купить эти ингредиенты:"
             f"{ingredients_list}"
         )
+
+
+class ShoppingListTotalQuerySet(models.QuerySet):
+    """Инкрементальное обновление сумм ингредиентов в списках покупок."""
+
+    def apply(self, user_ids, amounts):
+        """Прибавляет к суммам пользователей user_ids изменения amounts
+        вида {id ингредиента: изменение количества}."""
+        amounts = {key: value for key, value in amounts.items() if value}
+        user_ids = list(user_ids)
+        if not amounts or not user_ids:
+            return
+        self.bulk_create(
+            (
+                ShoppingListTotal(
+                    user_id=user_id, ingredient_id=ingredient_id, total=0
+                )
+                for user_id in user_ids
+                for ingredient_id, amount in amounts.items()
+                if amount > 0
+            ),
+            ignore_conflicts=True,
+        )
+        rows = self.filter(user_id__in=user_ids, ingredient_id__in=amounts)
+        rows.update(
+            total=F("total")
+            + Case(
+                *(
+                    When(ingredient_id=ingredient_id, then=Value(amount))
+                    for ingredient_id, amount in amounts.items()
+                ),
+                default=Value(0),
+                output_field=models.IntegerField(),
+            )
+        )
+        rows.filter(total__lte=0).delete()
+
+    def recipe_amounts(self, recipe_ids, sign=1):
+        return {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in IngredientRecipe.objects.filter(
+                recipe_id__in=recipe_ids
+            )
+            .values_list("ingredient_id")
+            .annotate(amount=Sum("amount"))
+            .order_by()
+        }
+
+    def add_recipes(self, user_id, recipe_ids):
+        self.apply([user_id], self.recipe_amounts(recipe_ids))
+
+    def remove_recipes(self, user_id, recipe_ids):
+        self.apply([user_id], self.recipe_amounts(recipe_ids, sign=-1))
+
+    def actual(self):
+        """Суммы, посчитанные заново по спискам покупок и рецептам."""
+        return (
+            IngredientRecipe.objects.filter(
+                recipe__shopping_list__isnull=False
+            )
+            .values_list("recipe__shopping_list__user", "ingredient")
+            .annotate(total=Sum("amount"))
+            .order_by()
+        )
+
+
+class ShoppingListTotal(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Таблица обновляется при изменении списка покупок и ингредиентов
+    рецептов, поэтому выгрузка списка читает готовые суммы.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_totals",
+        verbose_name="Пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="shopping_totals",
+        verbose_name="Ингредиент",
+    )
+    total = models.IntegerField("Количество", default=0)
+
+    objects = ShoppingListTotalQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Сумма в списке покупок"
+        verbose_name_plural = "Суммы в списках покупок"
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"], name="unique_shopping_total"
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.user.username}: {self.ingredient.name} — {self.total}"
+        )
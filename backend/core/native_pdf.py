@@ -0,0 +1,96 @@
+import datetime
+import io
+import os
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.template.defaultfilters import floatformat
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+FONT_NAME = "OpenSans-Medium"
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 50
+HEADER_HEIGHT = 40
+FOOTER_HEIGHT = 80
+
+
+@lru_cache(maxsize=None)
+def register_font():
+    """Регистрирует шрифт один раз на процесс."""
+    path = os.path.join(settings.STATIC_ROOT, f"{FONT_NAME}.ttf")
+    pdfmetrics.registerFont(TTFont(FONT_NAME, path))
+    return FONT_NAME
+
+
+def draw_page(canvas, document):
+    """Рисует шапку и подвал страницы, как в шаблоне html_to_pdf.html."""
+    canvas.saveState()
+    center = PAGE_WIDTH / 2
+    canvas.setFont(FONT_NAME, 20)
+    canvas.setFillColor(colors.red)
+    canvas.drawCentredString(
+        center, PAGE_HEIGHT - MARGIN - HEADER_HEIGHT / 2, "Список покупок"
+    )
+    canvas.setFillColor(colors.black)
+    canvas.setFont(FONT_NAME, 11)
+    bottom = MARGIN
+    canvas.drawCentredString(center, bottom, f"Страница - {document.page}")
+    canvas.drawCentredString(
+        center, bottom + 20, f"© {datetime.date.today().year} Copyright"
+    )
+    canvas.drawCentredString(
+        center, bottom + 34, 'Ваш "Продуктовый помощник"'
+    )
+    canvas.drawCentredString(center, bottom + 48, 'Сервис "Foodgram"')
+    canvas.restoreState()
+
+
+def render_native_pdf(rows):
+    """Строит PDF списка покупок напрямую через reportlab, без разбора
+    HTML и CSS. Таблица переносится на новые страницы с повтором шапки."""
+    font = register_font()
+    cell = ParagraphStyle(
+        "cell", fontName=font, fontSize=12, leading=15, alignment=TA_CENTER
+    )
+    data = [["Название", "Ед. изм.", "Количество"]]
+    data.extend(
+        [
+            Paragraph(escape(str(row["ingredient__name"])), cell),
+            Paragraph(escape(str(row["ingredient__measurement_unit"])), cell),
+            floatformat(row["total"], 0),
+        ]
+        for row in rows
+    )
+    table = Table(data, colWidths=(150, 60, 70), repeatRows=1)
+    table.setStyle(
+        TableStyle(
+            [
+                ("FONT", (0, 0), (-1, -1), font, 12),
+                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+                ("BOX", (0, 0), (-1, -1), 1, colors.black),
+                ("LINEBELOW", (0, 0), (-1, 0), 1, colors.black),
+                ("TOPPADDING", (0, 0), (-1, -1), 5),
+                ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
+            ]
+        )
+    )
+    result = io.BytesIO()
+    document = SimpleDocTemplate(
+        result,
+        pagesize=A4,
+        leftMargin=MARGIN,
+        rightMargin=MARGIN,
+        topMargin=MARGIN + HEADER_HEIGHT,
+        bottomMargin=MARGIN + FOOTER_HEIGHT,
+        title="Список покупок",
+    )
+    document.build([table], onFirstPage=draw_page, onLaterPages=draw_page)
+    return result.getvalue()
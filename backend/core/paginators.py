@@ -1,7 +1,54 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    """Пагинация по курсору на сортировке -id.
+
+    Страница выбирается условием id < последнего id, поэтому её стоимость
+    не зависит от глубины. Общее количество считается только с ?count=1.
+    """
+
+    ordering = "-id"
+    page_size = 6
+    page_size_query_param = "limit"
+    max_page_size = 100
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ("1", "true"):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data["count"] = self.count
+        return response
 
 
 class CustomPagination(PageNumberPagination):
+    """Постраничная пагинация, которая переключается на курсорную,
+    если в запросе передан параметр cursor (пустой — первая страница)."""
+
     page_size = 6
     page_size_query_param = "limit"
     max_page_size = 100
+    cursor_query_param = KeysetPagination.cursor_query_param
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.keyset is not None:
+            return self.keyset.get_html_context()
+        return super().get_html_context()
@@ -0,0 +1,115 @@
+import datetime
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.template.loader import get_template
+
+from .html_to_pdf import pdf_response, render_pdf
+
+
+@lru_cache(maxsize=None)
+def template_version(template):
+    """Хеш исходного кода шаблона: меняется вместе с шаблоном."""
+    source = get_template(template).template.source
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def make_key(template, rows):
+    """Строит ключ кеша по содержимому списка покупок, рендереру и версии
+    шаблона."""
+    payload = json.dumps(
+        [
+            template,
+            settings.SHOPPING_LIST_PDF_RENDERER,
+            template_version(template),
+            datetime.date.today().year,
+            rows,
+        ],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PDFCache:
+    """LRU-кеш готовых PDF-файлов в памяти процесса.
+
+    Размер ограничен как числом записей, так и суммарным объёмом файлов.
+    Ключ зависит только от содержимого, поэтому изменённый список покупок
+    никогда не получит устаревший файл; явная инвалидация по пользователю
+    лишь освобождает место раньше.
+    """
+
+    def __init__(self, max_bytes, max_entries):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size = 0
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._key_users = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+            return content
+
+    def _bind_user(self, user_id, key):
+        previous = self._user_keys.get(user_id)
+        if previous is not None and previous != key:
+            self._key_users[previous].discard(user_id)
+        self._user_keys[user_id] = key
+        self._key_users.setdefault(key, set()).add(user_id)
+
+    def _remove(self, key):
+        """Удаляет запись вместе со ссылками пользователей на неё."""
+        self.size -= len(self._entries.pop(key))
+        for user_id in self._key_users.pop(key, ()):
+            del self._user_keys[user_id]
+
+    def set(self, key, content, user_id=None):
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = content
+            self.size += len(content)
+            if user_id is not None:
+                self._bind_user(user_id, key)
+            while (
+                self.size > self.max_bytes
+                or len(self._entries) > self.max_entries
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            key = self._user_keys.get(user_id)
+            if key in self._entries:
+                self._remove(key)
+
+
+pdf_cache = PDFCache(
+    settings.SHOPPING_LIST_PDF_CACHE_BYTES,
+    settings.SHOPPING_LIST_PDF_CACHE_ENTRIES,
+)
+
+
+def cached_html_to_pdf(template, rows, user_id):
+    """Отдаёт PDF списка покупок из кеша или рендерит и кеширует его."""
+    key = make_key(template, rows)
+    content = pdf_cache.get(key)
+    if content is None:
+        content = render_pdf(template, {"context": rows})
+        if content is None:
+            return None
+        pdf_cache.set(key, content, user_id)
+    return pdf_response(content)
@@ -0,0 +1,128 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait as wait_futures
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+import django
+from django.conf import settings
+from django.core.cache import caches
+
+from .html_to_pdf import render_pdf
+from .pdf_cache import make_key, pdf_cache
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+_futures = {}
+_lock = threading.Lock()
+_executor = None
+cache = caches["pdf_jobs"]
+
+
+class QueueFullError(Exception):
+    """Очередь рендеринга PDF заполнена."""
+
+
+def _init_worker():
+    django.setup()
+
+
+def _render(template, rows):
+    return render_pdf(template, {"context": rows})
+
+
+def get_executor():
+    """Пул процессов создаётся лениво, уже после форка воркера gunicorn."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.SHOPPING_LIST_PDF_WORKERS,
+            initializer=_init_worker,
+        )
+    return _executor  # noqa: R504
+
+
+def _submit_render(template, rows):
+    """Отправляет рендеринг в пул, пересоздавая пул, если он сломан
+    аварийным завершением одного из процессов."""
+    global _executor
+    try:
+        return get_executor().submit(_render, template, rows)
+    except BrokenProcessPool:
+        _executor.shutdown(wait=False)
+        _executor = None
+        return get_executor().submit(_render, template, rows)
+
+
+def _job_key(job_id):
+    return f"pdf_job:{job_id}"
+
+
+def _save_job(job_id, job, content=None):
+    # Файл записывается раньше статуса, чтобы задача в статусе DONE
+    # никогда не читалась без содержимого.
+    if content is not None:
+        cache.set(
+            f"{_job_key(job_id)}:content",
+            content,
+            settings.SHOPPING_LIST_PDF_JOB_TIMEOUT,
+        )
+    cache.set(_job_key(job_id), job, settings.SHOPPING_LIST_PDF_JOB_TIMEOUT)
+
+
+def _finish(job_id, job, future):
+    with _lock:
+        _futures.pop(job_id, None)
+    content = None if future.exception() else future.result()
+    if content is None:
+        _save_job(job_id, dict(job, status=FAILED))
+        return
+    pdf_cache.set(job["key"], content, job["user_id"])
+    _save_job(job_id, dict(job, status=DONE), content)
+
+
+def submit(user_id, template, rows):
+    """Ставит рендеринг PDF в очередь и возвращает идентификатор задачи.
+
+    Если такой файл уже есть в кеше, задача сразу считается выполненной.
+    """
+    job_id = uuid.uuid4().hex
+    job = {"user_id": user_id, "key": make_key(template, rows)}
+    content = pdf_cache.get(job["key"])
+    if content is not None:
+        _save_job(job_id, dict(job, status=DONE), content)
+        return job_id
+    with _lock:
+        if len(_futures) >= settings.SHOPPING_LIST_PDF_QUEUE_SIZE:
+            raise QueueFullError
+        _save_job(job_id, dict(job, status=PENDING))
+        future = _submit_render(template, rows)
+        _futures[job_id] = future
+    future.add_done_callback(partial(_finish, job_id, job))
+    return job_id
+
+
+def get_job(job_id, user_id, timeout=0):
+    """Возвращает состояние задачи пользователя, при необходимости ожидая
+    её завершения не дольше timeout секунд."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = cache.get(_job_key(job_id))
+        if job is None or job["user_id"] != user_id:
+            return None
+        remaining = deadline - time.monotonic()
+        if job["status"] != PENDING or remaining <= 0:
+            return job
+        future = _futures.get(job_id)
+        if future is not None and not future.done():
+            wait_futures([future], timeout=remaining)
+        else:
+            time.sleep(min(remaining, 0.05))
+
+
+def get_content(job_id):
+    return cache.get(f"{_job_key(job_id)}:content")
@@ -0,0 +1,40 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+else:
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON-рендерер на orjson с тем же выводом, что и JSONRenderer.
+
+    Если orjson не установлен или нужен вывод с отступами или в ASCII,
+    работает стандартный рендерер DRF. Типы, которых orjson не знает,
+    и даты передаются кодировщику DRF, чтобы формат совпадал.
+    """
+
+    def use_orjson(self, data, accepted_media_type, renderer_context):
+        return (
+            orjson is not None
+            and data is not None
+            and self.compact
+            and not self.ensure_ascii
+            and self.get_indent(accepted_media_type, renderer_context) is None
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if not self.use_orjson(data, accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=self.encoder_class().default, option=OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
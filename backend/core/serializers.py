@@ -1,3 +1,4 @@
+from django.conf import settings
 from recipes.models import Recipe
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
@@ -5,6 +6,26 @@ from rest_framework.validators import UniqueTogetherValidator
 from .models import Favorite, ShoppingList
 
 
+class ValuesSerializer(serializers.BaseSerializer):
+    """Быстрое чтение строк из .values() без полей DRF.
+
+    Ключи ответа идут в порядке field_names. Значение берётся из метода
+    get_<поле>, если он есть, иначе из строки как есть.
+    """
+
+    field_names = ()
+
+    def to_representation(self, row):
+        return {
+            field: (
+                getattr(self, f"get_{field}")(row)
+                if hasattr(self, f"get_{field}")
+                else row[field]
+            )
+            for field in self.field_names
+        }
+
+
 class FavoriteCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для добавления рецепта в избранное."""
 
@@ -52,3 +73,13 @@ class ShoppingListCreateSerializer(serializers.ModelSerializer):
                 message="Этот рецепт уже есть в вашем списке.",
             )
         ]
+
+
+class ShoppingListBulkSerializer(serializers.Serializer):
+    """Сериализатор списка рецептов для пакетного изменения списка покупок."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.SHOPPING_CART_BULK_LIMIT,
+    )
@@ -0,0 +1,55 @@
+from core.counters import deleting_ids
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from recipes.models import Recipe
+from users.models import User
+
+from .models import Favorite, ShoppingList, ShoppingListTotal
+from .pdf_cache import pdf_cache
+
+
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+def shopping_list_changed(instance, **kwargs):
+    pdf_cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+def user_recipe_created(sender, instance, created, **kwargs):
+    if created:
+        sender.objects.update_counter([instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingList)
+def user_recipe_deleted(sender, instance, **kwargs):
+    if (
+        instance.recipe_id in deleting_ids(Recipe)
+        or instance.user_id in deleting_ids(User)
+    ):
+        return
+    sender.objects.update_counter([instance.recipe_id], -1)
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(instance, **kwargs):
+    # Счётчики рецептов из избранного и списка покупок удаляемого
+    # пользователя уменьшаются одним UPDATE на модель.
+    for model in (Favorite, ShoppingList):
+        field = model.counter_field
+        Recipe.objects.filter(
+            pk__in=model.objects.filter(user=instance).values("recipe_id")
+        ).update(**{field: F(field) - 1})
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(instance, **kwargs):
+    # Вычитается до каскадного удаления, пока связи со списками ещё есть.
+    user_ids = list(instance.shopping_list.values_list("user_id", flat=True))
+    if user_ids:
+        ShoppingListTotal.objects.apply(
+            user_ids,
+            ShoppingListTotal.objects.recipe_amounts([instance.id], sign=-1),
+        )
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -88,6 +89,41 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", default=""),
+    },
+    # Версию справочников должны видеть все воркеры, иначе после правки в
+    # админке они продолжат отдавать старые ответы и 304.
+    "catalog": {
+        "BACKEND": os.getenv(
+            "CATALOG_CACHE_BACKEND",
+            default="django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "CATALOG_CACHE_LOCATION",
+            default=os.path.join(tempfile.gettempdir(), "foodgram_catalog"),
+        ),
+    },
+    # Задачи рендеринга PDF читаются любым воркером, поэтому хранятся в
+    # отдельном кеше, общем для процессов и не вытесняемом ответами API.
+    "pdf_jobs": {
+        "BACKEND": os.getenv(
+            "PDF_JOBS_CACHE_BACKEND",
+            default="django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "PDF_JOBS_CACHE_LOCATION",
+            default=os.path.join(tempfile.gettempdir(), "foodgram_pdf_jobs"),
+        ),
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
+}
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -117,6 +153,10 @@ REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "SEARCH_PARAM": "name",
 }
 
@@ -153,5 +193,23 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
 NEGATIVE_RESULT = -1
 RECIPES_DEFAULT = 3
+RECIPES_SEARCH_CONFIG = "russian"
+INGREDIENTS_INDEX_ENABLED = True
+INGREDIENTS_SEARCH_LIMIT = 50
+INGREDIENTS_SEARCH_MAX_LIMIT = 500
+INGREDIENTS_FUZZY_THRESHOLD = 0.3
+INGREDIENTS_FUZZY_LIMIT = 20
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+CATALOG_CACHE_MAX_AGE = 60
+RECIPE_CACHE_TIMEOUT = 60 * 60
+RECIPE_DOCUMENTS_BATCH_SIZE = 500
+SHOPPING_CART_BULK_LIMIT = 500
+SHOPPING_LIST_PDF_RENDERER = os.getenv("PDF_RENDERER", default="html")
+SHOPPING_LIST_PDF_CACHE_BYTES = 32 * 1024 * 1024
+SHOPPING_LIST_PDF_CACHE_ENTRIES = 1000
+SHOPPING_LIST_PDF_WORKERS = int(os.getenv("PDF_WORKERS", default=2))
+SHOPPING_LIST_PDF_QUEUE_SIZE = int(os.getenv("PDF_QUEUE_SIZE", default=20))
+SHOPPING_LIST_PDF_JOB_TIMEOUT = 60 * 10
+SHOPPING_LIST_PDF_MAX_WAIT = 30
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
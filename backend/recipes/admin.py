@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Ingredient, IngredientRecipe, Recipe, Tag
+from .models import Ingredient, IngredientRecipe, Recipe, RecipeDocument, Tag
 
 
 @admin.register(Tag)
@@ -29,14 +29,13 @@ class IngredientRecipeInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ("name", "author")
+    list_display = ("name", "author", "favorites_count")
     list_filter = ("author", "name", "tags")
-    readonly_fields = ("favorite_count",)
+    readonly_fields = ("favorites_count", "in_carts_count")
     inlines = [
         IngredientRecipeInline,
     ]
 
-    def favorite_count(self, instance):
-        return instance.favorite.count()
-
-    favorite_count.short_description = "Количество добавлений в избранное"
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        RecipeDocument.objects.rebuild([form.instance.pk])
@@ -0,0 +1,139 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+
+from .catalog import get_catalog_version
+from .models import Ingredient
+
+HOMOGLYPHS = str.maketrans("acekmopxy", "асекморху")
+
+
+def normalize(value):
+    """Приводит название к виду для поиска: без регистра, «ё» и лишних
+    пробелов. Латинские буквы, похожие на кириллические, заменяются
+    в словах, где уже есть кириллица."""
+    words = []
+    for word in value.casefold().replace("ё", "е").split():
+        if any("а" <= char <= "я" for char in word):
+            word = word.translate(HOMOGLYPHS)
+        words.append(word)
+    return " ".join(words)
+
+
+def trigrams(value):
+    """Разбивает строку на триграммы так же, как это делает pg_trgm."""
+    result = set()
+    for word in re.findall(r"[^\W_]+", value.lower()):
+        padded = f"  {word} "
+        result.update(
+            padded[position:position + 3]
+            for position in range(len(padded) - 2)
+        )
+    return result
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для поиска по префиксу.
+
+    Названия хранятся в отсортированном массиве, поиск выполняется
+    бинарным поиском. Индекс перестраивается при смене версии справочника.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = (None, [], [])
+        self._trigrams = (None, [], {})
+
+    def build(self, version):
+        rows = sorted(
+            (normalize(name), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                "id", "name", "measurement_unit"
+            )
+        )
+        self._state = (
+            version,
+            [row[0] for row in rows],
+            [
+                {"id": pk, "name": name, "measurement_unit": unit}
+                for _, pk, name, unit in rows
+            ],
+        )
+
+    def refresh(self):
+        version = get_catalog_version()
+        if self._state[0] != version:
+            with self._lock:
+                if self._state[0] != version:
+                    self.build(version)
+        return self._state
+
+    def search(self, prefix, limit):
+        _, keys, items = self.refresh()
+        key = normalize(prefix)
+        start = bisect_left(keys, key)
+        result = []
+        for position in range(start, min(start + limit, len(keys))):
+            if not keys[position].startswith(key):
+                break
+            result.append(items[position])
+        return result
+
+    def refresh_trigrams(self):
+        version, keys, items = self.refresh()
+        if self._trigrams[0] != version:
+            with self._lock:
+                if self._trigrams[0] != version:
+                    grams = [trigrams(key) for key in keys]
+                    inverted = {}
+                    for position, key_grams in enumerate(grams):
+                        for gram in key_grams:
+                            inverted.setdefault(gram, []).append(position)
+                    self._trigrams = (version, grams, inverted)
+        return keys, items, self._trigrams[1], self._trigrams[2]
+
+    def fuzzy_search(self, query, limit, threshold):
+        """Ранжирует названия по триграммной похожести, как pg_trgm."""
+        keys, items, grams, inverted = self.refresh_trigrams()
+        query_grams = trigrams(normalize(query))
+        common = Counter()
+        for gram in query_grams:
+            common.update(inverted.get(gram, ()))
+        scored = []
+        for position, shared in common.items():
+            score = shared / (len(query_grams) + len(grams[position]) - shared)
+            if score >= threshold:
+                scored.append((-score, keys[position], position))
+        return [
+            items[position]
+            for _, _, position in heapq.nsmallest(limit, scored)
+        ]
+
+
+ingredient_index = IngredientIndex()
+
+
+def fuzzy_search(query, limit):
+    """Ищет ингредиенты с опечатками.
+
+    В PostgreSQL используется GIN-индекс pg_trgm, на остальных базах
+    ранжирование выполняется по индексу в памяти.
+    """
+    threshold = settings.INGREDIENTS_FUZZY_THRESHOLD
+    limit = min(limit, settings.INGREDIENTS_FUZZY_LIMIT)
+    if connection.vendor != "postgresql":
+        return ingredient_index.fuzzy_search(query, limit, threshold)
+    query = normalize(query)
+    return list(
+        Ingredient.objects.filter(name__trigram_similar=query)
+        .annotate(similarity=TrigramSimilarity("name", query))
+        .filter(similarity__gte=threshold)
+        .order_by("-similarity", "name")
+        .values("id", "name", "measurement_unit")[:limit]
+    )
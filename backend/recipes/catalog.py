@@ -0,0 +1,61 @@
+import threading
+import time
+
+from django.core.cache import caches
+
+from .models import Tag
+
+CATALOG_VERSION_KEY = "recipes:catalog_version"
+cache = caches["catalog"]
+
+
+def get_catalog_version():
+    """Возвращает текущую версию справочников тегов и ингредиентов.
+
+    Версия хранится в кеше "catalog", общем для всех процессов (по
+    умолчанию файловом), поэтому её изменение видят все воркеры. Если
+    ключ потерян, новая версия берётся из текущего времени и не
+    совпадает ни с одной из выданных ранее.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is not None:
+        return version
+    cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+    return cache.get(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Сообщает об изменении справочников."""
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        return get_catalog_version()
+
+
+class TagSlugMap:
+    """Соответствие слагов тегов их id в памяти процесса.
+
+    Перечитывается из базы только при смене версии справочника.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = (None, {})
+
+    def refresh(self):
+        version = get_catalog_version()
+        if self._state[0] != version:
+            with self._lock:
+                if self._state[0] != version:
+                    self._state = (
+                        version,
+                        dict(Tag.objects.values_list("slug", "id")),
+                    )
+        return self._state[1]
+
+    def ids(self, slugs):
+        mapping = self.refresh()
+        return [mapping[slug] for slug in slugs if slug in mapping]
+
+
+tag_slug_map = TagSlugMap()
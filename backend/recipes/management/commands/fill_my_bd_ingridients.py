@@ -1,22 +1,168 @@
 import csv
+import io
+import json
+import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes.catalog import bump_catalog_version
 from recipes.models import Ingredient
 
+JSON_SEPARATORS = " \t\r\n"
+
 
 class Command(BaseCommand):
-    help = "Загрузка из csv файла"
-
-    def handle(self, *args, **kwargs):
-        data_path = settings.BASE_DIR
-        with open(
-            f"{data_path}/data/ingredients.csv", "r", encoding="utf-8"
-        ) as file:
-            reader = csv.reader(file)
-            for row in reader:
-                name, measurement_unit = row
-                Ingredient.objects.create(
-                    name=name, measurement_unit=measurement_unit
+    help = (
+        "Загрузка ингредиентов из csv или json файла. "
+        "Повторный запуск не создаёт дубликатов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default=os.path.join(settings.BASE_DIR, "data", "ingredients.csv"),
+            help="Путь до файла с ингредиентами.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=("csv", "json"),
+            help="Формат файла, по умолчанию определяется по расширению.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Количество строк в одном INSERT.",
+        )
+        parser.add_argument(
+            "--copy",
+            action="store_true",
+            help="Загрузить через COPY (только PostgreSQL).",
+        )
+
+    def read_csv(self, file):
+        for row in csv.reader(file):
+            if len(row) != 2:
+                continue
+            yield row[0].strip(), row[1].strip()
+
+    def read_json(self, file, chunk_size=64 * 1024):
+        """Читает массив JSON по одному объекту, не загружая файл целиком."""
+        decoder = json.JSONDecoder()
+        buffer = self.read_more(file, "", chunk_size, "")
+        if not buffer.startswith("["):
+            raise CommandError("Ожидается массив JSON.")
+        buffer = buffer[1:]
+        while True:
+            buffer = self.read_more(file, buffer, chunk_size, ",")
+            if buffer.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                more = file.read(chunk_size)
+                if not more:
+                    raise CommandError("Некорректный JSON.")
+                buffer += more
+                continue
+            buffer = buffer[end:]
+            yield item["name"].strip(), item["measurement_unit"].strip()
+
+    def read_more(self, file, buffer, chunk_size, separators):
+        """Отбрасывает разделители в начале буфера, дочитывая файл, пока
+        буфер не начнётся со значимого символа."""
+        buffer = buffer.lstrip(JSON_SEPARATORS + separators)
+        while not buffer:
+            more = file.read(chunk_size)
+            if not more:
+                raise CommandError("Неожиданный конец JSON.")
+            buffer = more.lstrip(JSON_SEPARATORS + separators)
+        return buffer
+
+    def chunks(self, rows, size):
+        rows = iter(rows)
+        chunk = list(islice(rows, size))
+        while chunk:
+            yield chunk
+            chunk = list(islice(rows, size))
+
+    def load_bulk(self, rows, batch_size):
+        """Вставляет строки пачками, пропуская уже существующие."""
+        total = 0
+        for chunk in self.chunks(rows, batch_size):
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in chunk
+                ),
+                ignore_conflicts=True,
+            )
+            total += len(chunk)
+        return total
+
+    def load_copy(self, rows, batch_size):
+        """Загружает строки через COPY во временную таблицу и переносит
+        их в таблицу ингредиентов одним INSERT ... ON CONFLICT."""
+        table = Ingredient._meta.db_table
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE ingredient_import "
+                "(name varchar(200), measurement_unit varchar(200)) "
+                "ON COMMIT DROP"
+            )
+            for chunk in self.chunks(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(chunk)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    "COPY ingredient_import FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+                total += len(chunk)
+            cursor.execute(
+                f"INSERT INTO {table} (name, measurement_unit) "
+                "SELECT DISTINCT name, measurement_unit "
+                "FROM ingredient_import "
+                "ON CONFLICT (name, measurement_unit) DO NOTHING"
+            )
+        return total
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        data_format = options["format"] or os.path.splitext(path)[1][1:]
+        if data_format not in ("csv", "json"):
+            raise CommandError(f"Неизвестный формат файла: {path}")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть больше нуля.")
+        use_copy = options["copy"]
+        if use_copy and connection.vendor != "postgresql":
+            self.stdout.write(
+                self.style.WARNING(
+                    "COPY доступен только для PostgreSQL, "
+                    "используется bulk_create."
                 )
-        self.stdout.write(self.style.SUCCESS("Все ингредиенты  загружены!"))
+            )
+            use_copy = False
+
+        started = time.monotonic()
+        count_before = Ingredient.objects.count()
+        with open(path, "r", encoding="utf-8") as file, transaction.atomic():
+            rows = getattr(self, f"read_{data_format}")(file)
+            load = self.load_copy if use_copy else self.load_bulk
+            total = load(rows, options["batch_size"])
+        created = Ingredient.objects.count() - count_before
+        if created:
+            bump_catalog_version()
+        elapsed = max(time.monotonic() - started, 1e-6)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Обработано строк: {total}, добавлено: {created}, "
+                f"пропущено: {total - created} "
+                f"за {elapsed:.2f} с ({total / elapsed:.0f} строк/с)."
+            )
+        )
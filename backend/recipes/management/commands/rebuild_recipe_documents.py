@@ -0,0 +1,74 @@
+from itertools import islice
+
+from django.core.management import BaseCommand
+from recipes.models import Recipe, RecipeDocument
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверка и пересборка документов рецептов по текущим данным "
+        "рецептов, тегов, ингредиентов и авторов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только сообщить о расхождениях, ничего не меняя.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Пересобрать все документы без сравнения.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Количество рецептов, проверяемых за один раз.",
+        )
+
+    def chunks(self, rows, size):
+        rows = iter(rows)
+        chunk = list(islice(rows, size))
+        while chunk:
+            yield chunk
+            chunk = list(islice(rows, size))
+
+    def find_drift(self, recipe_ids):
+        actual = RecipeDocument.objects.build(recipe_ids)
+        stored = dict(
+            RecipeDocument.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list("recipe_id", "document")
+        )
+        return [
+            recipe_id
+            for recipe_id, document in actual.items()
+            if stored.get(recipe_id) != document
+        ]
+
+    def handle(self, *args, **options):
+        recipe_ids = Recipe.objects.order_by("id").values_list("id", flat=True)
+        if options["all"] and not options["check"]:
+            RecipeDocument.objects.rebuild_in_batches(
+                recipe_ids, options["batch_size"]
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Документы пересобраны: {recipe_ids.count()}."
+                )
+            )
+            return
+        drift = 0
+        for chunk in self.chunks(recipe_ids, options["batch_size"]):
+            stale = self.find_drift(chunk)
+            drift += len(stale)
+            if stale and not options["check"]:
+                RecipeDocument.objects.rebuild(stale)
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Расхождений нет."))
+            return
+        self.stdout.write(self.style.WARNING(f"Найдено расхождений: {drift}."))
+        if not options["check"]:
+            self.stdout.write(self.style.SUCCESS("Документы пересобраны."))
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:00
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    duplicates = (
+        Ingredient.objects.values('name', 'measurement_unit')
+        .annotate(keep_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for group in duplicates:
+        extra = Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=group['keep_id'])
+        IngredientRecipe.objects.filter(ingredient__in=extra).update(
+            ingredient_id=group['keep_id']
+        )
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:02
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+TRIGRAM_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['name'], name='ingredient_name_trgm', opclasses=['gin_trgm_ops']
+)
+
+
+def add_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.add_index(
+        apps.get_model('recipes', 'Ingredient'), TRIGRAM_INDEX
+    )
+
+
+def remove_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.remove_index(
+        apps.get_model('recipes', 'Ingredient'), TRIGRAM_INDEX
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_trigram_index, remove_trigram_index),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='ingredient',
+                    index=TRIGRAM_INDEX,
+                ),
+            ],
+        ),
+    ]
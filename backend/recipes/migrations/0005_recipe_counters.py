@@ -0,0 +1,52 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:14
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        favorites_count=count_of(apps.get_model('core', 'Favorite')),
+        in_carts_count=count_of(apps.get_model('core', 'ShoppingList')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_ingredient_name_trgm'),
+        ('core', '0004_shoppinglisttotal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Количество добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Количество добавлений в список покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
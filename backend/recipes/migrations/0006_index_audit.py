@@ -0,0 +1,61 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_rows(apps, schema_editor):
+    TagRecipe = apps.get_model('recipes', 'TagRecipe')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    duplicates = (
+        TagRecipe.objects.values('tag', 'recipe')
+        .annotate(keep_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for group in duplicates:
+        TagRecipe.objects.filter(
+            tag=group['tag'], recipe=group['recipe']
+        ).exclude(id=group['keep_id']).delete()
+    # Количества повторяющихся ингредиентов складываются, чтобы не менялись
+    # суммы в списках покупок.
+    duplicates = (
+        IngredientRecipe.objects.values('recipe', 'ingredient')
+        .annotate(keep_id=Min('id'), total=Count('id'), amount=Sum('amount'))
+        .filter(total__gt=1)
+    )
+    for group in duplicates:
+        rows = IngredientRecipe.objects.filter(
+            recipe=group['recipe'], ingredient=group['ingredient']
+        )
+        rows.exclude(id=group['keep_id']).delete()
+        rows.update(amount=group['amount'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredientrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_ingredient_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagrecipe',
+            constraint=models.UniqueConstraint(fields=('tag', 'recipe'), name='unique_tag_recipe'),
+        ),
+        migrations.AlterField(
+            model_name='ingredientrecipe',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipe', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='tagrecipe',
+            name='tag',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='recipes.tag', verbose_name='Тег'),
+        ),
+    ]
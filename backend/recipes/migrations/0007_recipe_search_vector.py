@@ -0,0 +1,55 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:18
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['search_vector'], name='recipe_search_idx'
+)
+
+
+def add_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        search_vector=SearchVector('name', weight='A', config='russian')
+        + SearchVector('text', weight='B', config='russian')
+    )
+    schema_editor.add_index(Recipe, SEARCH_INDEX)
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.remove_index(
+        apps.get_model('recipes', 'Recipe'), SEARCH_INDEX
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_index_audit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_search_index, remove_search_index),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='recipe',
+                    index=SEARCH_INDEX,
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeDocument',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('document', models.JSONField(verbose_name='Документ')),
+            ],
+            options={
+                'verbose_name': 'Документ рецепта',
+                'verbose_name_plural': 'Документы рецептов',
+            },
+        ),
+    ]
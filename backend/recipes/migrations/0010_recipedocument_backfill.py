@@ -0,0 +1,81 @@
+from itertools import islice
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def build_documents(apps, recipe_ids):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    TagRecipe = apps.get_model('recipes', 'TagRecipe')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    documents = {
+        recipe['id']: {
+            'id': recipe['id'],
+            'tags': [],
+            'author': [
+                recipe['author_id'],
+                recipe['author__email'],
+                recipe['author__username'],
+                recipe['author__first_name'],
+                recipe['author__last_name'],
+            ],
+            'ingredients': [],
+            'name': recipe['name'],
+            'image': recipe['image'],
+            'text': recipe['text'],
+            'cooking_time': recipe['cooking_time'],
+        }
+        for recipe in Recipe.objects.filter(pk__in=recipe_ids).values(
+            'id', 'author_id', 'author__email', 'author__username',
+            'author__first_name', 'author__last_name', 'name', 'image',
+            'text', 'cooking_time',
+        )
+    }
+    for recipe_id, *tag in TagRecipe.objects.filter(
+        recipe_id__in=documents
+    ).order_by('id').values_list(
+        'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+    ):
+        documents[recipe_id]['tags'].append(tag)
+    for recipe_id, *ingredient in IngredientRecipe.objects.filter(
+        recipe_id__in=documents
+    ).order_by('id').values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount',
+    ):
+        documents[recipe_id]['ingredients'].append(ingredient)
+    return documents
+
+
+def backfill_documents(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeDocument = apps.get_model('recipes', 'RecipeDocument')
+    recipe_ids = iter(
+        Recipe.objects.filter(document__isnull=True)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    chunk = list(islice(recipe_ids, BATCH_SIZE))
+    while chunk:
+        RecipeDocument.objects.bulk_create(
+            (
+                RecipeDocument(recipe_id=recipe_id, document=document)
+                for recipe_id, document in build_documents(
+                    apps, chunk
+                ).items()
+            ),
+            ignore_conflicts=True,
+        )
+        chunk = list(islice(recipe_ids, BATCH_SIZE))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipedocument'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,14 @@
-from django.db import models
+from itertools import islice
+
+from core.counters import CounterFieldsMixin
+from django.apps import apps
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
+from django.db import connections, models, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from users.models import User
 
 
@@ -27,11 +37,132 @@ class Ingredient(models.Model):
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
 
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "measurement_unit"], name="unique_ingredient"
+            )
+        ]
+        indexes = [
+            GinIndex(
+                fields=["name"],
+                name="ingredient_name_trgm",
+                opclasses=["gin_trgm_ops"],
+            )
+        ]
+
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов рецептов с аннотациями для выдачи через API."""
+
+    def is_postgresql(self):
+        return connections[self.db].vendor == "postgresql"
+
+    def update_search_vector(self):
+        """Пересчитывает поисковый вектор: название важнее описания."""
+        if not self.is_postgresql():
+            return
+        config = settings.RECIPES_SEARCH_CONFIG
+        self.update(
+            search_vector=SearchVector("name", weight="A", config=config)
+            + SearchVector("text", weight="B", config=config)
+        )
+
+    def search(self, query):
+        """Полнотекстовый поиск по названию и описанию с рангом rank.
+
+        Вне PostgreSQL ищет подстроку, выше ставя совпадения в названии.
+        """
+        if not self.is_postgresql():
+            return self.filter(
+                models.Q(name__icontains=query)
+                | models.Q(text__icontains=query)
+            ).annotate(
+                rank=models.Case(
+                    models.When(name__icontains=query, then=1.0),
+                    default=0.0,
+                    output_field=models.FloatField(),
+                )
+            )
+        search_query = SearchQuery(
+            query,
+            config=settings.RECIPES_SEARCH_CONFIG,
+            search_type="websearch",
+        )
+        return self.filter(search_vector=search_query).annotate(
+            rank=SearchRank(models.F("search_vector"), search_query)
+        )
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты рецептов заранее."""
+        return self.select_related("author").prefetch_related(
+            "tags",
+            models.Prefetch(
+                "recipe",
+                queryset=IngredientRecipe.objects.select_related(
+                    "ingredient"
+                ),
+            ),
+        )
+
+    def with_document(self):
+        """Подгружает автора и готовый документ рецепта."""
+        return self.select_related("author", "document").defer(
+            "text", "search_vector"
+        )
+
+    def first_per_author(self, limit):
+        """Оставляет не больше limit последних рецептов каждого автора."""
+        ranked = (
+            self.order_by()
+            .annotate(
+                author_position=models.Window(
+                    expression=RowNumber(),
+                    partition_by=[models.F("author_id")],
+                    order_by=models.F("id").desc(),
+                )
+            )
+            .values("id", "author_position")
+        )
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(
+            id__in=RawSQL(
+                f"SELECT id FROM ({sql}) ranked "
+                "WHERE author_position <= %s",
+                (*params, limit),
+            )
+        )
+
+    def with_user_flags(self, user):
+        """Добавляет флаги избранного и списка покупок одним запросом."""
+        if not user or user.is_anonymous:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        favorite = apps.get_model("core", "Favorite")
+        shopping_list = apps.get_model("core", "ShoppingList")
+        return self.annotate(
+            is_favorited=models.Exists(
+                favorite.objects.filter(
+                    recipe=models.OuterRef("pk"), user=user
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                shopping_list.objects.filter(
+                    recipe=models.OuterRef("pk"), user=user
+                )
+            ),
+        )
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """Модель для рецепта."""
 
     author = models.ForeignKey(
@@ -56,11 +187,31 @@ class Recipe(models.Model):
     cooking_time = models.PositiveSmallIntegerField(
         "Время приготовления (мин)"
     )
+    favorites_count = models.IntegerField(
+        "Количество добавлений в избранное", default=0, editable=False
+    )
+    in_carts_count = models.IntegerField(
+        "Количество добавлений в список покупок", default=0, editable=False
+    )
+    search_vector = SearchVectorField(
+        "Поисковый вектор", null=True, editable=False
+    )
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
+
+    objects = RecipeQuerySet.as_manager()
+    counter_fields = ("favorites_count", "in_carts_count")
 
     class Meta:
         ordering = ("-id",)
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = [
+            models.Index(
+                fields=["-favorites_count", "-id"],
+                name="recipe_favorites_count_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="recipe_search_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -80,12 +231,19 @@ class IngredientRecipe(models.Model):
         on_delete=models.CASCADE,
         related_name="recipe",
         verbose_name="Рецепт",
+        db_index=False,
     )
     amount = models.PositiveSmallIntegerField("Количество")
 
     class Meta:
         verbose_name = "Ингредиент в рецепте"
         verbose_name_plural = "Ингредиенты в рецептах"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "ingredient"],
+                name="unique_ingredient_recipe",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.ingredient.name} объявлен в {self.recipe.name}"
@@ -94,7 +252,9 @@ class IngredientRecipe(models.Model):
 class TagRecipe(models.Model):
     """Промежуточная модель связи тега и рецепта."""
 
-    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, verbose_name="Тег")
+    tag = models.ForeignKey(
+        Tag, on_delete=models.CASCADE, verbose_name="Тег", db_index=False
+    )
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, verbose_name="Рецепт"
     )
@@ -102,6 +262,127 @@ class TagRecipe(models.Model):
     class Meta:
         verbose_name = "Тег и рецепт"
         verbose_name_plural = "Теги и рецепты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tag", "recipe"], name="unique_tag_recipe"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.tag.name} добавлен к рецепту: {self.recipe.name}"
+
+
+class RecipeDocumentQuerySet(models.QuerySet):
+    """Сборка документов рецептов из нормализованных таблиц."""
+
+    def build(self, recipe_ids):
+        """Возвращает {id рецепта: документ} по текущим данным.
+
+        Автор, теги и ингредиенты хранятся списками значений, а не
+        словарями, чтобы порядок полей не зависел от того, как база хранит
+        JSON.
+        """
+        documents = {
+            recipe["id"]: {
+                "id": recipe["id"],
+                "tags": [],
+                "author": [
+                    recipe["author_id"],
+                    recipe["author__email"],
+                    recipe["author__username"],
+                    recipe["author__first_name"],
+                    recipe["author__last_name"],
+                ],
+                "ingredients": [],
+                "name": recipe["name"],
+                "image": recipe["image"],
+                "text": recipe["text"],
+                "cooking_time": recipe["cooking_time"],
+            }
+            for recipe in Recipe.objects.filter(pk__in=recipe_ids).values(
+                "id",
+                "author_id",
+                "author__email",
+                "author__username",
+                "author__first_name",
+                "author__last_name",
+                "name",
+                "image",
+                "text",
+                "cooking_time",
+            )
+        }
+        for recipe_id, *tag in (
+            TagRecipe.objects.filter(recipe_id__in=documents)
+            .order_by("id")
+            .values_list(
+                "recipe_id", "tag_id", "tag__name", "tag__color", "tag__slug"
+            )
+        ):
+            documents[recipe_id]["tags"].append(tag)
+        for recipe_id, *ingredient in (
+            IngredientRecipe.objects.filter(recipe_id__in=documents)
+            .order_by("id")
+            .values_list(
+                "recipe_id",
+                "ingredient_id",
+                "ingredient__name",
+                "ingredient__measurement_unit",
+                "amount",
+            )
+        ):
+            documents[recipe_id]["ingredients"].append(ingredient)
+        return documents
+
+    @transaction.atomic
+    def rebuild(self, recipe_ids):
+        """Пересобирает документы рецептов и возвращает их.
+
+        Вставка пропускает уже существующие строки, поэтому два запроса,
+        одновременно собирающие один документ, не падают на первичном
+        ключе.
+        """
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return {}
+        documents = self.build(recipe_ids)
+        self.filter(recipe_id__in=recipe_ids).delete()
+        self.bulk_create(
+            (
+                RecipeDocument(recipe_id=recipe_id, document=document)
+                for recipe_id, document in documents.items()
+            ),
+            ignore_conflicts=True,
+        )
+        return documents
+
+    def rebuild_in_batches(self, recipe_ids, batch_size=None):
+        """Пересобирает документы частями, каждая в своей транзакции."""
+        batch_size = batch_size or settings.RECIPE_DOCUMENTS_BATCH_SIZE
+        recipe_ids = iter(recipe_ids)
+        chunk = list(islice(recipe_ids, batch_size))
+        while chunk:
+            self.rebuild(chunk)
+            chunk = list(islice(recipe_ids, batch_size))
+
+
+class RecipeDocument(models.Model):
+    """Представление рецепта без данных, зависящих от пользователя."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="document",
+        verbose_name="Рецепт",
+    )
+    document = models.JSONField("Документ")
+
+    objects = RecipeDocumentQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Документ рецепта"
+        verbose_name_plural = "Документы рецептов"
+
+    def __str__(self):
+        return f"Документ рецепта {self.recipe_id}"
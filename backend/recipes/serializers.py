@@ -1,13 +1,16 @@
 import base64
+from collections import Counter
 
-from core.models import Favorite, ShoppingList
+from core.models import ShoppingListTotal
+from core.serializers import ValuesSerializer
 from django.core.files.base import ContentFile
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
-from users.serializers import UsersListSerializer
+from users.serializers import UsersListSerializer, get_following_ids
 
-from .models import Ingredient, IngredientRecipe, Recipe, Tag, TagRecipe
+from .models import (Ingredient, IngredientRecipe, Recipe, RecipeDocument,
+                     Tag, TagRecipe)
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -18,6 +21,15 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit")
 
 
+class IngredientValuesSerializer(ValuesSerializer):
+    """Ингредиенты из Ingredient.objects.values(*values_fields).
+
+    Ответ совпадает с IngredientSerializer.
+    """
+
+    field_names = values_fields = IngredientSerializer.Meta.fields
+
+
 class IngredientRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для ингредиентов с количеством в рецепте."""
 
@@ -79,8 +91,8 @@ class RecipeSerializer(serializers.ModelSerializer):
     author = UsersListSerializer(read_only=True)
     ingredients = IngredientRecipeSerializer(many=True, source="recipe")
     image = Base64ImageField()
-    is_favorited = serializers.SerializerMethodField(read_only=True)
-    is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Recipe
@@ -95,19 +107,70 @@ class RecipeSerializer(serializers.ModelSerializer):
             "image",
             "text",
             "cooking_time",
+            "favorites_count",
+            "in_carts_count",
         )
 
-    def get_is_favorited(self, obj):
-        user = self.context["request"].user
-        if not user or user.is_anonymous:
-            return False
-        return Favorite.objects.filter(recipe=obj, user=user).exists()
 
-    def get_is_in_shopping_cart(self, obj):
-        user = self.context["request"].user
-        if not user or user.is_anonymous:
-            return False
-        return ShoppingList.objects.filter(recipe=obj, user=user).exists()
+class RecipeDocumentSerializer(serializers.BaseSerializer):
+    """Выдача рецепта из готового документа RecipeDocument.
+
+    Ответ совпадает с RecipeSerializer: к документу добавляются флаги
+    текущего пользователя и счётчики из основного запроса.
+    """
+
+    def get_document(self, instance):
+        try:
+            return instance.document.document
+        except RecipeDocument.DoesNotExist:
+            return RecipeDocument.objects.rebuild([instance.pk])[instance.pk]
+
+    def get_image_url(self, name):
+        if not name:
+            return None
+        url = Recipe._meta.get_field("image").storage.url(name)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    def to_representation(self, instance):
+        document = self.get_document(instance)
+        author_id, email, username, first_name, last_name = document["author"]
+        return {
+            "id": document["id"],
+            "tags": [
+                {"id": tag_id, "name": name, "color": color, "slug": slug}
+                for tag_id, name, color, slug in document["tags"]
+            ],
+            "author": {
+                "id": author_id,
+                "email": email,
+                "username": username,
+                "first_name": first_name,
+                "last_name": last_name,
+                "is_subscribed": author_id in get_following_ids(self.context),
+                "recipes_count": instance.author.recipes_count,
+                "followers_count": instance.author.followers_count,
+            },
+            "ingredients": [
+                {
+                    "id": ingredient_id,
+                    "name": name,
+                    "measurement_unit": measurement_unit,
+                    "amount": amount,
+                }
+                for ingredient_id, name, measurement_unit, amount in document[
+                    "ingredients"
+                ]
+            ],
+            "is_favorited": instance.is_favorited,
+            "is_in_shopping_cart": instance.is_in_shopping_cart,
+            "name": document["name"],
+            "image": self.get_image_url(document["image"]),
+            "text": document["text"],
+            "cooking_time": document["cooking_time"],
+            "favorites_count": instance.favorites_count,
+            "in_carts_count": instance.in_carts_count,
+        }
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -140,38 +203,100 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
 
     def to_representation(self, value):
-        return RecipeSerializer(value, context=self.context).data
+        recipe = (
+            Recipe.objects.with_related()
+            .with_user_flags(self.context["request"].user)
+            .get(pk=value.pk)
+        )
+        return RecipeSerializer(recipe, context=self.context).data
+
+    def validate_ingredients(self, value):
+        ids = [item["id"] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                "Ингредиенты в рецепте не должны повторяться."
+            )
+        found = Ingredient.objects.in_bulk(ids)
+        missing = sorted(set(ids) - found.keys())
+        if missing:
+            raise serializers.ValidationError(
+                "Ингредиенты не найдены: "
+                f"{', '.join(str(item) for item in missing)}."
+            )
+        return value
 
+    def save_ingredients(self, recipe, ingredient_list):
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                ingredient_id=item["id"], recipe=recipe, amount=item["amount"]
+            )
+            for item in ingredient_list
+        )
+
+    @transaction.atomic
     def create(self, validated_data):
         tags_list = validated_data.pop("tags")
         ingredient_list = validated_data.pop("ingredients")
         recipe = Recipe.objects.create(**validated_data)
-        for item in ingredient_list:
-            ingredient = get_object_or_404(Ingredient, id=item.get("id"))
-            IngredientRecipe.objects.create(
-                ingredient=ingredient, recipe=recipe, amount=item.get("amount")
-            )
-        for item in tags_list:
-            TagRecipe.objects.create(tag=item, recipe=recipe)
+        self.save_ingredients(recipe, ingredient_list)
+        TagRecipe.objects.bulk_create(
+            TagRecipe(tag=item, recipe=recipe)
+            for item in dict.fromkeys(tags_list)
+        )
+        RecipeDocument.objects.rebuild([recipe.pk])
         return recipe
 
-    def update(self, instance, validated_data):
-        if validated_data.get("image") is not None:
-            instance.image = validated_data.pop("image")
-        instance.name = validated_data.get("name")
-        instance.text = validated_data.get("text")
-        instance.cooking_time = validated_data.get("cooking_time")
+    def update_ingredients(self, recipe, ingredient_list):
+        """Синхронизирует ингредиенты рецепта, затрагивая только изменения.
+
+        Возвращает изменение количества по каждому ингредиенту.
+        """
+        amounts = {item["id"]: item["amount"] for item in ingredient_list}
+        deltas = Counter(amounts)
+        current = {}
+        stale = []
+        changed = []
+        for row in IngredientRecipe.objects.filter(recipe=recipe):
+            deltas[row.ingredient_id] -= row.amount
+            amount = amounts.get(row.ingredient_id)
+            if amount is None or row.ingredient_id in current:
+                stale.append(row.pk)
+                continue
+            current[row.ingredient_id] = row
+            if row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if stale:
+            IngredientRecipe.objects.filter(pk__in=stale).delete()
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ("amount",))
+        self.save_ingredients(
+            recipe,
+            (
+                {"id": ingredient_id, "amount": amount}
+                for ingredient_id, amount in amounts.items()
+                if ingredient_id not in current
+            ),
+        )
+        return deltas
 
-        tags_list = validated_data.pop("tags")
-        instance.tags.set(tags_list)
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        tags_list = validated_data.pop("tags", None)
+        ingredient_list = validated_data.pop("ingredients", None)
+        if validated_data.get("image") is None:
+            validated_data.pop("image", None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save()
 
-        ingredient_list = validated_data.pop("ingredients")
-        instance.ingredients.clear()
-        for item in ingredient_list:
-            ingredient = get_object_or_404(Ingredient, id=item.get("id"))
-            instance.ingredients.add(
-                ingredient, through_defaults={"amount": item.get("amount")}
+        if tags_list is not None:
+            instance.tags.set(dict.fromkeys(tags_list))
+        if ingredient_list is not None:
+            deltas = self.update_ingredients(instance, ingredient_list)
+            ShoppingListTotal.objects.apply(
+                instance.shopping_list.values_list("user_id", flat=True),
+                deltas,
             )
-
-        instance.save()
+        RecipeDocument.objects.rebuild([instance.pk])
         return instance
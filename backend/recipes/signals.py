@@ -0,0 +1,114 @@
+from core.counters import deleting_ids
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from users.models import User
+
+from .catalog import bump_catalog_version
+from .models import (Ingredient, IngredientRecipe, Recipe, RecipeDocument,
+                     Tag, TagRecipe)
+
+AUTHOR_DOCUMENT_FIELDS = {"email", "username", "first_name", "last_name"}
+
+
+def rebuild_documents(recipe_ids):
+    """Пересобирает документы частями после фиксации транзакции.
+
+    Изменение популярного тега, ингредиента или автора затрагивает много
+    рецептов, поэтому они не собираются одним запросом и одной транзакцией.
+    """
+    transaction.on_commit(
+        lambda: RecipeDocument.objects.rebuild_in_batches(recipe_ids)
+    )
+
+
+def recipe_ids_for(instance):
+    if isinstance(instance, Tag):
+        rows = TagRecipe.objects.filter(tag=instance)
+    else:
+        rows = IngredientRecipe.objects.filter(ingredient=instance)
+    return list(rows.values_list("recipe_id", flat=True).distinct())
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def catalog_changed(**kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F("recipes_count") + 1
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, update_fields, **kwargs):
+    if update_fields is None or {"name", "text"} & set(update_fields):
+        Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(instance, **kwargs):
+    deleting_ids(Recipe).add(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    deleting_ids(Recipe).discard(instance.pk)
+    if instance.author_id in deleting_ids(User):
+        return
+    User.objects.filter(pk=instance.author_id).update(
+        recipes_count=F("recipes_count") - 1
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+def catalog_item_saved(instance, created, **kwargs):
+    if not created:
+        rebuild_documents(recipe_ids_for(instance))
+
+
+@receiver(pre_delete, sender=Ingredient)
+@receiver(pre_delete, sender=Tag)
+def catalog_item_deleting(instance, **kwargs):
+    # Связи удаляются каскадом, поэтому рецепты запоминаются заранее.
+    instance.document_recipe_ids = recipe_ids_for(instance)
+
+
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+def catalog_item_deleted(instance, **kwargs):
+    rebuild_documents(getattr(instance, "document_recipe_ids", ()))
+
+
+@receiver(pre_save, sender=User)
+def author_saving(instance, update_fields, raw, **kwargs):
+    # update_fields у сохранения пользователя почти всегда содержит все
+    # поля профиля, поэтому изменения сверяются с сохранёнными значениями.
+    instance.document_changed = False
+    fields = AUTHOR_DOCUMENT_FIELDS
+    if update_fields is not None:
+        fields = fields & set(update_fields)
+    if raw or instance._state.adding or not fields:
+        return
+    stored = User.objects.filter(pk=instance.pk).values(*fields).first()
+    instance.document_changed = stored is not None and any(
+        stored[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def author_saved(instance, created, **kwargs):
+    if created or not getattr(instance, "document_changed", False):
+        return
+    rebuild_documents(
+        list(instance.recipe.order_by("id").values_list("id", flat=True))
+    )
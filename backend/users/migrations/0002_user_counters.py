@@ -0,0 +1,48 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:14
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(author=OuterRef('pk'))
+            .order_by()
+            .values('author')
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    User.objects.update(
+        recipes_count=count_of(apps.get_model('recipes', 'Recipe')),
+        followers_count=count_of(apps.get_model('users', 'Follow')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,9 @@
+from core.counters import CounterFieldsMixin
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
     """Модель Пользователя."""
 
     email = models.EmailField(
@@ -14,6 +15,14 @@ class User(AbstractUser):
     first_name = models.CharField("Имя", max_length=150)
     last_name = models.CharField("Фамилия", max_length=150)
     password = password = models.CharField("Пароль", max_length=150)
+    recipes_count = models.IntegerField(
+        "Количество рецептов", default=0, editable=False
+    )
+    followers_count = models.IntegerField(
+        "Количество подписчиков", default=0, editable=False
+    )
+
+    counter_fields = ("recipes_count", "followers_count")
 
     class Meta(AbstractUser.Meta):
         swappable = "AUTH_USER_MODEL"
@@ -38,6 +47,7 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name="following",
         verbose_name="Автор",
+        db_index=False,
     )
 
     class Meta:
@@ -53,6 +63,11 @@ class Follow(models.Model):
                 name="self-subscription_avoidance",
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=["author", "user"], name="follow_author_user_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} подписан на {self.author.username}"
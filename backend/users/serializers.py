@@ -1,5 +1,4 @@
-from core.serializers import FavoriteShoppingListSerializer
-from django.conf import settings
+from core.serializers import FavoriteShoppingListSerializer, ValuesSerializer
 from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions as django_exceptions
 from djoser.serializers import UserCreateSerializer, UserSerializer
@@ -9,6 +8,26 @@ from rest_framework.validators import UniqueTogetherValidator
 from .models import Follow, User
 
 
+def get_following_ids(context):
+    """Возвращает id авторов, на которых подписан текущий пользователь.
+
+    Множество загружается один раз за запрос и хранится в общем контексте
+    сериализаторов, поэтому его переиспользуют все вложенные авторы.
+    """
+    if "following_ids" not in context:
+        user = context["request"].user
+        context["following_ids"] = (
+            set(
+                Follow.objects.filter(user=user).values_list(
+                    "author_id", flat=True
+                )
+            )
+            if user.is_authenticated
+            else set()
+        )
+    return context["following_ids"]
+
+
 class UserRegistrationSerializer(UserCreateSerializer):
     """Кастомный сериализатор для создания пользователя."""
 
@@ -45,16 +64,27 @@ class UsersListSerializer(UserSerializer):
             "first_name",
             "last_name",
             "is_subscribed",
+            "recipes_count",
+            "followers_count",
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context.get("request").user
-        return (
-            user.is_authenticated
-            and Follow.objects.filter(
-                user=self.context["request"].user, author=obj
-            ).exists()
-        )
+        return obj.id in get_following_ids(self.context)
+
+
+class UsersListValuesSerializer(ValuesSerializer):
+    """Список пользователей из User.objects.values(*values_fields).
+
+    Ответ совпадает с UsersListSerializer.
+    """
+
+    field_names = UsersListSerializer.Meta.fields
+    values_fields = tuple(
+        field for field in field_names if field != "is_subscribed"
+    )
+
+    def get_is_subscribed(self, row):
+        return row["id"] in get_following_ids(self.context)
 
 
 class SetPasswordSerializer(serializers.Serializer):
@@ -92,9 +122,8 @@ class SetPasswordSerializer(serializers.Serializer):
 class SubscriptionSerializer(serializers.ModelSerializer):
     """Сериализатор для подписок."""
 
-    is_subscribed = serializers.SerializerMethodField()
+    is_subscribed = serializers.BooleanField(read_only=True)
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -107,21 +136,13 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             "is_subscribed",
             "recipes",
             "recipes_count",
+            "followers_count",
         )
 
-    def get_is_subscribed(self, obj):
-        user = self.context["request"].user
-        return bool(obj.following.filter(user=user))
-
     def get_recipes(self, obj):
-        limit = self.context["request"].query_params.get(
-            "recipes_limit", settings.RECIPES_DEFAULT
-        )
-        recipes = obj.recipe.all()[: int(limit)]
-        return FavoriteShoppingListSerializer(recipes, many=True).data
-
-    def get_recipes_count(self, obj):
-        return obj.recipe.count()
+        return FavoriteShoppingListSerializer(
+            obj.limited_recipes, many=True
+        ).data
 
 
 class SubscriptionCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,37 @@
+from core.counters import deleting_ids
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Follow, User
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            followers_count=F("followers_count") + 1
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(instance, **kwargs):
+    deleting = deleting_ids(User)
+    if instance.user_id in deleting or instance.author_id in deleting:
+        return
+    User.objects.filter(pk=instance.author_id).update(
+        followers_count=F("followers_count") - 1
+    )
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(instance, **kwargs):
+    deleting_ids(User).add(instance.pk)
+    User.objects.filter(
+        pk__in=Follow.objects.filter(user=instance).values("author_id")
+    ).update(followers_count=F("followers_count") - 1)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(instance, **kwargs):
+    deleting_ids(User).discard(instance.pk)
@@ -1,5 +1,8 @@
 from core.paginators import CustomPagination
+from django.conf import settings
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch
 from django.shortcuts import get_object_or_404
+from recipes.models import Recipe
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -8,7 +11,7 @@ from rest_framework.response import Response
 from .models import Follow, User
 from .serializers import (SetPasswordSerializer, SubscriptionCreateSerializer,
                           SubscriptionSerializer, UserRegistrationSerializer,
-                          UsersListSerializer)
+                          UsersListSerializer, UsersListValuesSerializer)
 
 
 class UserViewSet(
@@ -31,11 +34,47 @@ class UserViewSet(
     permission_classes = (AllowAny,)
     pagination_class = CustomPagination
 
+    def get_queryset(self):
+        if self.action in ("list", "retrieve"):
+            return self.queryset.values(
+                *UsersListValuesSerializer.values_fields
+            )
+        return super().get_queryset()
+
     def get_serializer_class(self):
         if self.action in ("list", "retrieve"):
-            return UsersListSerializer
+            return UsersListValuesSerializer
         return UserRegistrationSerializer
 
+    def annotate_subscriptions(self, queryset):
+        """Готовит авторов для SubscriptionSerializer без запросов на строку.
+
+        Признак подписки считается в основном запросе, а рецепты подгружаются
+        одним запросом с ограничением recipes_limit на каждого автора.
+        """
+        user = self.request.user
+        limit = int(
+            self.request.query_params.get(
+                "recipes_limit", settings.RECIPES_DEFAULT
+            )
+        )
+        return queryset.annotate(
+            is_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef("pk")),
+                output_field=BooleanField(),
+            ),
+        ).prefetch_related(
+            Prefetch(
+                "recipe",
+                queryset=Recipe.objects.filter(
+                    author__in=Follow.objects.filter(user=user).values(
+                        "author"
+                    )
+                ).first_per_author(limit),
+                to_attr="limited_recipes",
+            )
+        )
+
     @action(
         detail=False,
         methods=["get"],
@@ -67,7 +106,9 @@ class UserViewSet(
         pagination_class=CustomPagination,
     )
     def subscriptions(self, request):
-        queryset = User.objects.filter(following__user=request.user)
+        queryset = self.annotate_subscriptions(
+            User.objects.filter(following__user=request.user)
+        )
         page = self.paginate_queryset(queryset)
         serializer = SubscriptionSerializer(
             page, many=True, context={"request": request}
@@ -91,7 +132,10 @@ class UserViewSet(
             sub_serializer.is_valid(raise_exception=True)
             follow = sub_serializer.save()
             serializer = SubscriptionSerializer(
-                follow.author, context={"request": request}
+                self.annotate_subscriptions(User.objects.all()).get(
+                    pk=follow.author_id
+                ),
+                context={"request": request},
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 